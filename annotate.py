@@ -0,0 +1,103 @@
+# annotate.py
+# 整段文本注音：逐块读入、逐块输出，内存占用与文本长度无关。
+#   * 表内的字（含可归并到表内字的异体字）→ 普通话 / 粤语 / 中古音
+#   * 其余字符原样输出（连续的合并为一段）
+# 多音字列出全部读音（按表中次序）：字频表只有字的频次、没有各读音的频次，
+# 无从判断一个字哪个读音最常用，ruby 里也就不挑“首选读音”，全部列出。
+import codecs
+import json
+
+from markupsafe import escape
+
+from query import LANG_MAP, lookup, resolve_glyphs
+
+SYSTEMS = {
+    "普通话": "mandarin",
+    "粤语": "cantonese",
+    "广韵": "middle",
+}
+
+
+def char_readings(indexes, char, col):
+    """字在某一读音列下的全部读音（按表中次序，去重）"""
+    names = indexes["readings"].names
+    return [names[rid] for rid in dict.fromkeys(
+        rid for r in lookup(indexes, char) for rid in r.reading_ids(col)
+    )]
+
+
+# ================================
+# 文本 → 片段
+# ================================
+def iter_text(stream, chunk_size=1 << 14):
+    """二进制流 → 文本块（增量 UTF-8 解码，不会截断多字节字符）"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def annotate_chunks(chunks, indexes):
+    """
+    文本块 → 每块对应的片段列表：
+      {"text": "東", "mandarin": [...], "cantonese": [...], "middle": [...]}
+      {"text": "，"}（表外字符，连续的合并为一段）
+    """
+    seen = {}
+
+    for chunk in chunks:
+        tokens = []
+        plain = []
+        for ch in chunk:
+            if ch not in seen and not resolve_glyphs(indexes, ch):
+                plain.append(ch)
+                continue
+            if plain:
+                tokens.append({"text": "".join(plain)})
+                plain = []
+            if ch not in seen:
+                token = {"text": ch}
+                for lang, attr in SYSTEMS.items():
+                    token[attr] = char_readings(indexes, ch, LANG_MAP[lang])
+                seen[ch] = token
+            tokens.append(seen[ch])
+        if plain:
+            tokens.append({"text": "".join(plain)})
+        yield tokens
+
+
+# ================================
+# 输出格式
+# ================================
+def to_jsonl(token_chunks):
+    for tokens in token_chunks:
+        yield "".join(json.dumps(t, ensure_ascii=False) + "\n" for t in tokens)
+
+
+def to_html(token_chunks, ruby="普通话"):
+    """<ruby> 注音：rt 列出所选读音系统的全部读音（以 / 分隔），title 给出三套读音全部"""
+    attr = SYSTEMS.get(ruby, "mandarin")
+    yield '<!DOCTYPE html>\n<html lang="zh">\n<head><meta charset="UTF-8"></head>\n<body>\n<p>'
+    for tokens in token_chunks:
+        out = []
+        for t in tokens:
+            if len(t) == 1:
+                out.append(str(escape(t["text"])).replace("\n", "<br>\n"))
+                continue
+            title = " | ".join(
+                f"{lang} {'/'.join(t[a])}" for lang, a in SYSTEMS.items() if t[a]
+            )
+            rt = "/".join(t[attr])
+            out.append(
+                f'<ruby title="{escape(title)}">{escape(t["text"])}'
+                f"<rt>{escape(rt)}</rt></ruby>"
+            )
+        yield "".join(out)
+    yield "</p>\n</body>\n</html>\n"
@@ -1,190 +1,826 @@
-from flask import Flask, render_template, request
-import csv
-import json
-from collections import defaultdict
+from flask import (
+    Flask, Response, g, has_request_context, jsonify, make_response,
+    render_template, request, stream_with_context
+)
+import functools
+import hashlib
+import hmac
+import math
+import os
+import time
+from contextlib import contextmanager
+
+from query import LANG_MAP, rank_result
+from engine import open_engine
+from annotate import annotate_chunks, iter_text, to_html, to_jsonl
+from cache import LRUCache
+from category_search import ATTR_KEYS, parse_conditions
+from fanqie import KINDS
+from near_search import DEFAULT_DISTANCE, DEFAULT_TONE_COST
+from metrics import Metrics, SIZE_BUCKETS, TIME_BUCKETS
+from reload import Reloader
+import snapshot
 
 app = Flask(__name__)
-
-CSV_PATH = "guangyun_with_all_readings.csv"
+app.json.ensure_ascii = False
+app.json.sort_keys = False
 
 # ================================
-# 读取基础广韵 + 拼音数据
+# 查询引擎：默认内存（预编译快照，缺失/过期时回退 CSV + 字频表），
+# PJK_ENGINE=sqlite 时改用 SQLite。数据变更后由下方的 reloader 整体替换，
+# engine / data_version 总是指向最新一份（请求内请用 current_engine()）
 # ================================
-def load_data(path):
-    rows = []
-    with open(path, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            rows.append(r)
-    return rows
+_startup = time.perf_counter()
+engine = open_engine()
+data_version = engine.version
+STARTUP_SECONDS = time.perf_counter() - _startup
 
-rows = load_data(CSV_PATH)
 
 # ================================
-# 读取频率表（提前生成）
+# 指标：分阶段计时、按模式 / 方向计数、结果大小分布，/metrics 输出；
+# PJK_SERVER_TIMING=1 时同时在响应头 Server-Timing 中给出本次请求各阶段耗时
 # ================================
-with open("mandarin_freq_all.json", "r", encoding="utf-8") as f:
-    mandarin_freq = json.load(f)
-
-with open("cantonese_freq_all.json", "r", encoding="utf-8") as f:
-    cantonese_freq = json.load(f)
+SERVER_TIMING = os.environ.get("PJK_SERVER_TIMING", "") not in ("", "0")
+
+metrics = Metrics()
+metrics.describe("pjk_requests_total", "counter", "按端点与状态码统计的请求数")
+metrics.describe("pjk_request_seconds", "histogram", "请求处理耗时（秒）", TIME_BUCKETS)
+metrics.describe("pjk_stage_seconds", "histogram", "各处理阶段耗时（秒）", TIME_BUCKETS)
+metrics.describe("pjk_queries_total", "counter", "按模式与方向统计的查询数")
+metrics.describe("pjk_result_glyphs", "histogram", "同音字结果字数", SIZE_BUCKETS)
+metrics.describe("pjk_reloads_total", "counter", "数据热重载次数")
+metrics.describe("pjk_cache_hits_total", "counter", "缓存命中数")
+metrics.describe("pjk_cache_misses_total", "counter", "缓存未命中数")
+metrics.describe("pjk_cache_entries", "gauge", "缓存当前条目数")
+metrics.describe("pjk_startup_seconds", "gauge", "进程启动时加载数据、打开引擎的耗时（秒）")
+metrics.describe("pjk_data_info", "gauge", "当前数据版本与查询引擎")
+
+
+@contextmanager
+def timed(stage):
+    """记录一个处理阶段的耗时（同时记入本次请求的 Server-Timing）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("pjk_stage_seconds", elapsed, stage=stage)
+        if SERVER_TIMING and has_request_context():
+            g.setdefault("timings", []).append((stage, elapsed))
 
 
 # ================================
-# 建立 {读音 : [字]} 索引
+# 核心：跨系统查询（由当前引擎完成）
 # ================================
-def build_index(rows, key):
-    index = defaultdict(list)
-    for r in rows:
-        val = r.get(key, "")
-        if not val:
-            continue
-        for p in val.replace("\n", "；").split("；"):
-            p = p.strip()
-            if p:
-                index[p].append(r["glyph"])
-    return index
+def compare_pronunciations(engine, from_lang, to_lang, char, filter_common):
+
+    col_from = LANG_MAP.get(from_lang)
+    col_to = LANG_MAP.get(to_lang)
+
+    if not col_from or not col_to:
+        return {"error": "无效语言选项"}
+
+    # ==== 1. 输入字在源语言的所有读音 ====
+    with timed("readings"):
+        readings = engine.readings(char, col_from)
+    if not readings:
+        return {"error": f"未找到「{char}」的 {from_lang} 读音"}
+
+    # ==== 2. 同音字及其在目标语言中的分组 ====
+    with timed("homophones"):
+        return engine.compare_readings(from_lang, to_lang, readings, filter_common)
+
+
+def observe_result(result, from_lang, to_lang):
+    """同音字结果字数：每次响应都记（不论是否命中缓存），出错的结果不计"""
+    if result and "same_sound" in result:
+        metrics.observe(
+            "pjk_result_glyphs", len(result["same_sound"]), direction=f"{from_lang}→{to_lang}"
+        )
+
+
+# 指标标签只取已知的值，查询串里的任意取值一律记作 "invalid"，以免标签组合无限增长
+PAGE_MODES = ("basic", "compare", "reading", "category")
+
+
+def query_labels(mode, from_lang, to_lang):
+    """首页查询的 (mode, direction) 指标标签"""
+    if mode and mode not in PAGE_MODES:
+        return "invalid", ""
+    if mode != "compare":
+        return mode or "", ""
+    if from_lang not in LANG_MAP or to_lang not in LANG_MAP:
+        return mode, "invalid"
+    return mode, f"{from_lang}→{to_lang}"
 
 
 # ================================
-# 过滤字是否常用
+# 按字频排序 / 截断：rank_by=auto|mandarin|cantonese|overall，
+# min_freq=最低字频，percentile=只留前 P% 的常用字，limit=每组最多 k 个
 # ================================
-def is_common_char(glyph, from_lang):
-    """根据源语言决定用哪个字频过滤"""
-    if from_lang == "普通话":
-        return mandarin_freq.get(glyph, 0) > 0
-    if from_lang == "粤语":
-        return cantonese_freq.get(glyph, 0) > 0
-    # 广韵 → 只要出现在广韵数据中即可
-    return True
+RANK_BY = ("auto", "mandarin", "cantonese", "overall")
+
+
+def parse_ranking(params):
+    """请求参数 → (rank_by, min_freq, percentile, limit)；都没给时返回 None，无效时抛 ValueError"""
+    def value(name):
+        v = params.get(name)
+        return None if v is None or v == "" else v
+
+    rank_by = value("rank_by")
+    min_freq = value("min_freq")
+    percentile = value("percentile")
+    limit = value("limit")
+    if rank_by is None and min_freq is None and percentile is None and limit is None:
+        return None
+
+    rank_by = rank_by or "auto"
+    if rank_by not in RANK_BY:
+        raise ValueError("rank_by 只能是 auto、mandarin、cantonese 或 overall")
+    try:
+        min_freq = int(min_freq) if min_freq is not None else 0
+        percentile = float(percentile) if percentile is not None else None
+        limit = int(limit) if limit is not None else None
+    except (TypeError, ValueError):
+        raise ValueError("min_freq / limit 须为整数，percentile 须为数字")
+    if min_freq < 0 or (limit is not None and limit < 1):
+        raise ValueError("min_freq 不能为负，limit 至少为 1")
+    if percentile is not None and not 0 < percentile <= 100:
+        raise ValueError("percentile 须在 (0, 100] 之间")
+    return rank_by, min_freq, percentile, limit
 
 
 # ================================
-# 工具：根据 key 获取字的所有读音
+# 缓存：进程内 LRU + HTTP ETag / Cache-Control
+# 键里带数据版本号，数据重建后旧条目自然失效
 # ================================
-def get_pronunciations(rows, char, key):
-    return sorted({
-        p.strip()
-        for r in rows if r["glyph"] == char
-        for p in r.get(key, "").replace("\n", "；").split("；")
-        if p.strip()
-    })
+CACHE_SIZE = int(os.environ.get("PJK_CACHE_SIZE", "4096"))
+HTTP_MAX_AGE = int(os.environ.get("PJK_HTTP_MAX_AGE", "86400"))
+# 开着热重载时改用的短缓存期：换数据后下游至多这么久还拿到旧版本
+RELOAD_MAX_AGE = int(os.environ.get("PJK_RELOAD_MAX_AGE", "60"))
+
+result_cache = LRUCache(CACHE_SIZE)
+page_cache = LRUCache(CACHE_SIZE)
 
 
 # ================================
-# 核心：跨系统查询
+# 热重载：源文件或快照变化（或收到 SIGUSR2 / POST /api/reload）时后台载入新引擎，
+# 原子替换；每个请求开始时取定当时的引擎，处理中的请求不受影响。
+# PJK_RELOAD_INTERVAL 为轮询秒数（默认 0 不轮询），PJK_ADMIN_TOKEN 启用 /api/reload
 # ================================
-def compare_pronunciations(rows, from_lang, to_lang, char, filter_common):
+ADMIN_TOKEN = os.environ.get("PJK_ADMIN_TOKEN", "")
 
-    lang_map = {
-        "普通话": "mandarin_pinyin",
-        "粤语": "cantonese_jyutping",
-        "广韵": "polyhedron中古全拼",
-    }
-    col_from = lang_map.get(from_lang)
-    col_to = lang_map.get(to_lang)
 
-    if not col_from or not col_to:
-        return {"error": "无效语言选项"}
+def swap_engine(old, new):
+    global engine, data_version
+    engine, data_version = new, new.version
+    # 旧版本的缓存条目已不会再命中，直接清掉释放内存
+    result_cache.clear()
+    page_cache.clear()
+    metrics.inc("pjk_reloads_total")
+    metrics.set("pjk_data_info", 0, version=old.version, engine=old.name)
+    app.logger.info("数据已重载：%s → %s", old.version, new.version)
 
-    # ==== 1. 输入字在源语言的所有读音 ====
-    readings = get_pronunciations(rows, char, col_from)
-    if not readings:
-        return {"error": f"未找到「{char}」的 {from_lang} 读音"}
 
-    # ==== 2. 找同音字 ====
-    idx_from = build_index(rows, col_from)
-    same_sound = sorted({glyph for p in readings for glyph in idx_from.get(p, [])})
-
-    # ==== 3. 进行频率过滤 ====
-    if filter_common:
-        same_sound = [g for g in same_sound if is_common_char(g, from_lang)]
-
-    # ==== 4. 目标语言 = 广韵 → 特殊折叠格式 ====
-    if to_lang == "广韵":
-        fold = defaultdict(list)
-
-        for r in rows:
-            g = r["glyph"]
-            if g not in same_sound:
-                continue
-
-            mids = r.get("polyhedron中古全拼", "").replace("\n", "；").split("；")
-            poses = r.get("广韵信息", "").replace("\n", "；").split("；")
-
-            for mid, pos in zip(mids, poses):
-                mid = mid.strip()
-                pos = pos.strip()
-                if mid and pos:
-                    fold[(mid, pos)].append(g)
-
-        grouped = {
-            f"{mid}（{pos}）": "".join(lst)
-            for (mid, pos), lst in fold.items()
-        }
-
-        return {
-            "mode": "to_guangyun_fold",
-            "readings": readings,
-            "same_sound": same_sound,
-            "groups_folded": grouped
-        }
-
-    # ==== 5. 普通话 / 粤语 输出 ====
-    group = defaultdict(set)
-    for r in rows:
-        g = r["glyph"]
-        if g not in same_sound:
+reloader = Reloader(
+    engine, open_engine, snapshot.SOURCES + (snapshot.SNAPSHOT_PATH,),
+    f"{snapshot.SNAPSHOT_PATH}.lock", on_swap=swap_engine, outputs=(snapshot.SNAPSHOT_PATH,)
+)
+reloader.install_signal()
+
+
+def reload_enabled():
+    """轮询或 /api/reload 开着时数据可能随时换版本（只靠 SIGUSR2 时由运维自行清理下游缓存）"""
+    return reloader.interval > 0 or bool(ADMIN_TOKEN)
+
+
+def current_engine():
+    """本次请求取定的引擎（请求外为最新的引擎）"""
+    if has_request_context():
+        if "engine" not in g:
+            g.engine = reloader.current
+        return g.engine
+    return reloader.current
+
+
+def cached_lookup(char):
+    engine = current_engine()
+    key = (engine.version, "basic", "", "", char, False)
+    return result_cache.get_or_compute(key, lambda: engine.lookup(char))
+
+
+def cached_compare(from_lang, to_lang, char, filter_common, ranking=None):
+    engine = current_engine()
+    key = (engine.version, "compare", from_lang, to_lang, char, filter_common)
+    result = result_cache.get_or_compute(
+        key,
+        lambda: compare_pronunciations(engine, from_lang, to_lang, char, filter_common)
+    )
+    if ranking is None:
+        return result
+
+    def rank():
+        with timed("rank"):
+            return rank_result(engine.freq_table, result, from_lang, ranking)
+    return result_cache.get_or_compute(key + ranking, rank)
+
+
+def query_etag():
+    engine = current_engine()
+    digest = hashlib.sha1(request.full_path.encode("utf-8")).hexdigest()[:16]
+    return f"{engine.version}-{digest}"
+
+
+def http_cacheable(view):
+    """
+    带查询串的 GET：同一数据版本下结果不变，给出 ETag 并允许代理缓存。
+    开着热重载时数据随时可能换版本，只缓存 RELOAD_MAX_AGE（过期后带 ETag 回源验证，未变时是 304），
+    否则按 HTTP_MAX_AGE 缓存。
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != "GET" or not request.args:
+            return view(*args, **kwargs)
+
+        etag = query_etag()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = RELOAD_MAX_AGE if reload_enabled() else HTTP_MAX_AGE
+        return response
+    return wrapper
+
+
+# ================================
+# 批量查询：同一批内读音相同的字共享一次计算
+# ================================
+def compare_batch(engine, from_lang, to_lang, chars, filter_common, ranking=None):
+    if not LANG_MAP.get(from_lang) or not LANG_MAP.get(to_lang):
+        return {"error": "无效语言选项"}
+    col_from = LANG_MAP[from_lang]
+
+    results = {}
+    by_readings = {}
+    for char in dict.fromkeys(chars):
+        readings = engine.readings(char, col_from)
+        if not readings:
+            results[char] = {"error": f"未找到「{char}」的 {from_lang} 读音"}
             continue
-        for p in r.get(col_to, "").replace("\n", "；").split("；"):
-            if p.strip():
-                group[p.strip()].add(g)
-
-    return {
-        "mode": "normal",
-        "readings": readings,
-        "same_sound": same_sound,
-        "groups": {k: sorted(v) for k, v in sorted(group.items())}
+        key = tuple(readings)
+        if key not in by_readings:
+            with timed("homophones"):
+                result = engine.compare_readings(from_lang, to_lang, readings, filter_common)
+            if ranking is not None:
+                with timed("rank"):
+                    result = rank_result(engine.freq_table, result, from_lang, ranking)
+            by_readings[key] = result
+        results[char] = by_readings[key]
+        observe_result(results[char], from_lang, to_lang)
+    return results
+
+
+MAX_BATCH = 20000
+
+
+def parse_chars(value):
+    """"東西" 或 ["東", "西"] → ["東", "西"]（忽略空白）"""
+    if isinstance(value, str):
+        return [c for c in value if not c.isspace()]
+    if isinstance(value, list):
+        return [c.strip() for c in value if isinstance(c, str) and c.strip()]
+    return []
+
+
+def parse_directions(payload):
+    """
+    支持 directions: ["普通话→粤语", ["粤语", "广韵"]]，
+    或单个 from_lang / to_lang。
+    """
+    directions = payload.get("directions")
+    if directions is None and payload.get("from_lang") and payload.get("to_lang"):
+        directions = [[payload["from_lang"], payload["to_lang"]]]
+    if isinstance(directions, str):
+        directions = [d for d in directions.split(",") if d]
+
+    parsed = []
+    for d in directions or []:
+        if isinstance(d, str):
+            d = d.split("→")
+        if len(d) != 2 or d[0] not in LANG_MAP or d[1] not in LANG_MAP:
+            return None
+        parsed.append((d[0], d[1]))
+    return parsed
+
+
+def request_payload():
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        return payload
+    payload = request.values.to_dict()
+    if "chars" in request.values and len(request.values.getlist("chars")) > 1:
+        payload["chars"] = request.values.getlist("chars")
+    return payload
+
+
+def api_error(message, status=400):
+    return jsonify({"error": message}), status
+
+
+def parse_limit(args):
+    """limit 参数：未给时为 None；不是正整数时抛出 ValueError"""
+    value = args.get("limit", "").strip()
+    if not value:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit 须为整数") from None
+    if limit < 1:
+        raise ValueError("limit 至少为 1")
+    return limit
+
+
+@app.route("/api/lookup", methods=["GET", "POST"])
+@http_cacheable
+def api_lookup():
+    engine = current_engine()
+    payload = request_payload()
+    chars = parse_chars(payload.get("chars", ""))
+    if not chars:
+        return api_error("缺少 chars")
+    if len(chars) > MAX_BATCH:
+        return api_error(f"单次最多 {MAX_BATCH} 个字", 413)
+
+    # variants=1 时另附 {查询字 : [表内字形]}，只列经异体别名表查得（或并入了繁体来源）的字
+    show_variants = payload.get("variants") in (True, "on", "true", "1", 1)
+
+    metrics.inc("pjk_queries_total", mode="api_lookup", direction="")
+    results = {}
+    missing = []
+    variants = {}
+    for char in dict.fromkeys(chars):
+        records = engine.lookup(char)
+        if records:
+            results[char] = [dict(r) for r in records]
+            if show_variants:
+                resolved = engine.resolve(char)
+                if resolved != (char,):
+                    variants[char] = list(resolved)
+        else:
+            missing.append(char)
+    response = {"results": results, "missing": missing}
+    if show_variants:
+        response["variants"] = variants
+    return jsonify(response)
+
+
+@app.route("/api/compare", methods=["GET", "POST"])
+@http_cacheable
+def api_compare():
+    engine = current_engine()
+    payload = request_payload()
+    chars = parse_chars(payload.get("chars", ""))
+    if not chars:
+        return api_error("缺少 chars")
+    if len(chars) > MAX_BATCH:
+        return api_error(f"单次最多 {MAX_BATCH} 个字", 413)
+    directions = parse_directions(payload)
+    if not directions:
+        return api_error("缺少或无效的 directions（可选：普通话、粤语、广韵）")
+    filter_common = payload.get("filter_common") in (True, "on", "true", "1", 1)
+    try:
+        ranking = parse_ranking(payload)
+    except ValueError as e:
+        return api_error(str(e))
+
+    for from_lang, to_lang in dict.fromkeys(directions):
+        metrics.inc("pjk_queries_total", mode="api_compare", direction=f"{from_lang}→{to_lang}")
+    results = {
+        f"{from_lang}→{to_lang}": compare_batch(
+            engine, from_lang, to_lang, chars, filter_common, ranking
+        )
+        for from_lang, to_lang in dict.fromkeys(directions)
     }
+    return jsonify({"results": results})
+
+
+READING_MATCHES = ("prefix", "toneless", "exact")
+
+
+def reading_query(system, q, match="prefix", initial=None, final=None, tone=None,
+                  limit=None, with_glyphs=True):
+    """按读音查字：[{"reading": 读音, "glyphs": [字]}]"""
+    engine = current_engine()
+    col = LANG_MAP[system]
+    readings = engine.search_readings(col, q, match, initial, final, tone, limit)
+    if not with_glyphs:
+        return [{"reading": p} for p in readings]
+    return [{"reading": p, "glyphs": engine.reading_glyphs(col, p)} for p in readings]
+
+
+@app.route("/api/readings")
+@http_cacheable
+def api_readings():
+    """
+    按读音查字 / 输入提示。
+      system=普通话|粤语|广韵  q=读音（dung、dōng、dong1、lv…）
+      match=prefix（默认）| toneless | exact
+      initial / final / tone：声母 / 韵母 / 声调条件（"_" 表示零声母）
+      limit=N；glyphs=0 时只返回读音（供输入提示）
+    """
+    args = request.args
+    system = args.get("system", "普通话")
+    match = args.get("match", "prefix")
+    if system not in LANG_MAP:
+        return api_error("无效的 system（可选：普通话、粤语、广韵）")
+    if match not in READING_MATCHES:
+        return api_error("match 只能是 prefix、toneless 或 exact")
+
+    comps = {}
+    for key in ("initial", "final", "tone"):
+        value = args.get(key, "")
+        if value:
+            comps[key] = "" if value == "_" else value
+    q = args.get("q", "").strip()
+    if not q and not comps:
+        return api_error("缺少 q 或 initial / final / tone")
+    try:
+        limit = parse_limit(args)
+    except ValueError as e:
+        return api_error(str(e))
+
+    metrics.inc("pjk_queries_total", mode="api_readings", direction=system)
+    with timed("reading_search"):
+        results = reading_query(
+            system, q, match, limit=limit,
+            with_glyphs=args.get("glyphs", "1") != "0", **comps
+        )
+    return jsonify({"system": system, "results": results})
+
+
+def parse_breakdown(value):
+    """"普通话,粤语" → ("普通话", "粤语")；含未知系统时抛出 ValueError"""
+    systems = tuple(dict.fromkeys(
+        s.strip() for s in (value or "").replace("，", ",").split(",") if s.strip()
+    ))
+    for s in systems:
+        if s not in LANG_MAP:
+            raise ValueError(f"无效的 breakdown：{s}（可选：普通话、粤语、广韵）")
+    return systems
+
+
+def category_query(conds, breakdown=()):
+    """按音韵地位查字：{"count": 字数, "results": [...], "breakdown": {系统 : {读音 : [字]}}}"""
+    engine = current_engine()
+    results = engine.search_categories(conds)
+    out = {"count": len(results), "results": results}
+    if breakdown:
+        out["breakdown"] = engine.category_breakdown([r["glyph"] for r in results], breakdown)
+    return out
+
+
+@app.route("/api/categories")
+@http_cacheable
+def api_categories():
+    """
+    按中古音韵地位查字，多条件取交集（同一音节须同时满足）。
+      initial（声母，可为 章组 等）/ openness（呼）/ grade（等）/ tone（声调）/
+      rhyme（韵）/ she（摄）：亦可直接用中文参数名；逗号分隔的多个值取并集
+      breakdown=普通话,粤语：另附命中字在各系统下的读音分布
+    """
+    conds = parse_conditions(request.args)
+    if not conds:
+        return api_error("缺少条件（可选：" + "、".join(
+            f"{k}（{v}）" for k, v in ATTR_KEYS.items()) + "）")
+    try:
+        breakdown = parse_breakdown(request.args.get("breakdown"))
+        metrics.inc("pjk_queries_total", mode="api_categories", direction="")
+        with timed("category_search"):
+            result = category_query(conds, breakdown)
+    except ValueError as e:
+        return api_error(str(e))
+    return jsonify({"conditions": conds, **result})
+
+
+MAX_NEAR_DISTANCE = 3
+
+
+@app.route("/api/near")
+@http_cacheable
+def api_near():
+    """
+    近音字（按编辑距离）。
+      system=普通话|粤语|广韵  q=读音 或 char=字（取其全部读音）
+      distance=最大距离（默认 1，至多 3）  tone_cost=声调不同时加的距离（默认 1，0 为不计声调）
+      limit=N
+    """
+    engine = current_engine()
+    args = request.args
+    system = args.get("system", "粤语")
+    if system not in LANG_MAP:
+        return api_error("无效的 system（可选：普通话、粤语、广韵）")
+    q = args.get("q", "").strip()
+    char = args.get("char", "").strip()
+    if not q and not char:
+        return api_error("缺少 q 或 char")
+    distance = args.get("distance", DEFAULT_DISTANCE, type=int)
+    tone_cost = args.get("tone_cost", DEFAULT_TONE_COST, type=float)
+    if not 0 <= distance <= MAX_NEAR_DISTANCE or not math.isfinite(tone_cost) or tone_cost < 0:
+        return api_error(f"distance 须在 0–{MAX_NEAR_DISTANCE} 之间，tone_cost 须为非负的有限数")
+    try:
+        limit = parse_limit(args)
+    except ValueError as e:
+        return api_error(str(e))
+
+    metrics.inc("pjk_queries_total", mode="api_near", direction=system)
+    with timed("near_search"):
+        results = engine.near_homophones(system, q, char, distance, tone_cost, limit)
+    return jsonify({"system": system, "q": q, "char": char, "results": results})
+
+
+@app.route("/api/correspondence")
+@http_cacheable
+def api_correspondence():
+    """
+    中古音韵地位 × 现代读音成分 的列联表（建快照时已算好）。
+      mc=声母|呼|等|声调|韵  lang=普通话|粤语  part=initial|final|tone
+      weight=glyphs（默认，每字计 1）| freq（按字频加权）| unambiguous（只计单地位单读音字）
+      normalize=row | col | all：改为比例
+    """
+    engine = current_engine()
+    args = request.args
+    try:
+        with timed("correspondence"):
+            table = engine.contingency(
+                args.get("mc", "声调"), args.get("lang", "普通话"), args.get("part", "tone"),
+                args.get("weight", "glyphs"), args.get("normalize") or None
+            )
+    except ValueError as e:
+        return api_error(str(e))
+    metrics.inc("pjk_queries_total", mode="api_correspondence",
+                direction=f"{table['mc']}→{table['lang']}")
+    return jsonify(table)
+
+
+@app.route("/api/fanqie")
+@http_cacheable
+def api_fanqie():
+    """
+    反切系联。
+      char=字：各读音的反切，及上字所在声类、下字所在韵类
+      kind=upper|lower 加 speller=用字 或 class=类号：类的成员、系联边与全部被切字（limit=N）
+    """
+    engine = current_engine()
+    args = request.args
+    char = args.get("char", "").strip()
+    if char:
+        metrics.inc("pjk_queries_total", mode="api_fanqie", direction="")
+        return jsonify({"char": char, "readings": engine.char_fanqie(char)})
+
+    kind = args.get("kind", "upper")
+    if kind not in KINDS:
+        return api_error("kind 只能是 upper 或 lower")
+    speller = args.get("speller", "").strip()
+    cid = args.get("class", type=int)
+    if speller:
+        cids = engine.speller_classes(kind, speller)
+    elif cid is not None:
+        cids = [cid]
+    else:
+        return api_error("缺少 char，或 speller / class")
+    try:
+        limit = parse_limit(args)
+    except ValueError as e:
+        return api_error(str(e))
+    metrics.inc("pjk_queries_total", mode="api_fanqie", direction=kind)
+    try:
+        classes = [engine.class_detail(kind, c, limit) for c in cids]
+    except ValueError as e:
+        return api_error(str(e))
+    return jsonify({"kind": kind, "classes": classes})
+
+
+@app.route("/api/annotate", methods=["POST"])
+def api_annotate():
+    """
+    整段注音，流式返回。
+      正文：text/plain 原始请求体（边读边处理），或表单 / JSON 的 text 字段
+      参数：format=jsonl（默认）| html；ruby=普通话 | 粤语 | 广韵（html 注音所用读音）
+    """
+    engine = current_engine()
+    fmt = request.args.get("format", "jsonl")
+    if fmt not in ("jsonl", "html"):
+        return api_error("format 只能是 jsonl 或 html")
+
+    payload = request.get_json(silent=True) if request.is_json else None
+    if isinstance(payload, dict):
+        chunks = [payload.get("text") or ""]
+    elif request.form:
+        chunks = [request.form.get("text", "")]
+    else:
+        chunks = iter_text(request.stream)
+
+    metrics.inc("pjk_queries_total", mode="annotate", direction="")
+    tokens = annotate_chunks(chunks, engine.dataset["indexes"])
+    if fmt == "html":
+        body = to_html(tokens, request.args.get("ruby", "普通话"))
+        mimetype = "text/html"
+    else:
+        body = to_jsonl(tokens)
+        mimetype = "application/x-ndjson"
+    return Response(stream_with_context(body), mimetype=mimetype)
 
 
 # ================================
 # Flask 路由
 # ================================
+def render_page(mode="basic", char="", result=None, from_lang="", to_lang="",
+                filter_common=False, ranking=None, system="普通话", match="prefix",
+                conds=None, breakdown=()):
+    """渲染首页（静态导出 export.py 也用它）"""
+    return render_template(
+        "index.html",
+        mode=mode,
+        char=char,
+        result=result,
+        from_lang=from_lang,
+        to_lang=to_lang,
+        filter_common=filter_common,
+        ranking=ranking,
+        system=system,
+        match=match,
+        conds=conds or {},
+        breakdown=breakdown
+    )
+
+
 @app.route("/", methods=["GET", "POST"])
+@http_cacheable
 def index():
+    engine = current_engine()
     result = None
     mode = "basic"
     char = ""
     from_lang = to_lang = ""
     filter_common = False
+    ranking = None
+    ranking_error = None
+    system, match = "普通话", "prefix"
+    conds, breakdown = {}, ()
 
-    if request.method == "POST":
-        mode = request.form.get("mode")
+    # POST 表单与 GET 查询串（可缓存、可分享）同样处理
+    params = request.form if request.method == "POST" else request.args
+    if request.method == "POST" or "mode" in params:
+        mode = params.get("mode")
 
         if mode == "basic":
-            char = request.form.get("char_basic", "").strip()
-            result = [r for r in rows if r["glyph"] == char]
+            char = params.get("char_basic", "").strip()
 
         elif mode == "compare":
-            char = request.form.get("char_compare", "").strip()
-            from_lang = request.form.get("from_lang")
-            to_lang = request.form.get("to_lang")
-            filter_common = request.form.get("filter_common") == "on"
-
-            result = compare_pronunciations(
-                rows, from_lang, to_lang, char, filter_common
+            char = params.get("char_compare", "").strip()
+            from_lang = params.get("from_lang")
+            to_lang = params.get("to_lang")
+            filter_common = params.get("filter_common") == "on"
+            try:
+                ranking = parse_ranking(params)
+            except ValueError as e:
+                ranking_error = str(e)
+
+        elif mode == "reading":
+            char = params.get("reading", "").strip()
+            system = params.get("system", system)
+            match = params.get("match", match)
+            if system not in LANG_MAP or match not in READING_MATCHES:
+                system, match = "普通话", "prefix"
+
+        elif mode == "category":
+            conds = parse_conditions(params)
+            breakdown = tuple(s for s in params.getlist("breakdown") if s in LANG_MAP)
+
+    label_mode, direction = query_labels(mode, from_lang, to_lang)
+    metrics.inc("pjk_queries_total", mode=label_mode, direction=direction)
+
+    if ranking_error is not None:
+        # 与 /api/compare 一样以 400 报告无效的排序参数，不静默退回未排序的结果
+        return render_page(
+            mode, char, {"error": ranking_error}, from_lang, to_lang, filter_common
+        ), 400
+
+    key = (engine.version, mode, from_lang, to_lang, char, filter_common, ranking,
+           system, match, tuple((k, tuple(v)) for k, v in conds.items()), breakdown)
+    # 页面连同本次的音韵映射结果一并缓存，命中时结果字数照样计入指标
+    cached = page_cache.get(key)
+    if cached is not None:
+        page, result = cached
+    else:
+        with timed("query"):
+            if mode == "basic" and char:
+                result = cached_lookup(char)
+            elif mode == "compare":
+                result = cached_compare(from_lang, to_lang, char, filter_common, ranking)
+            elif mode == "reading" and char:
+                result = reading_query(system, char, match)
+            elif mode == "category" and conds:
+                try:
+                    result = category_query(conds, breakdown)
+                except ValueError as e:
+                    result = {"error": str(e)}
+
+        with timed("render"):
+            page = render_page(
+                mode, char, result, from_lang, to_lang, filter_common, ranking,
+                system, match, conds, breakdown
             )
-
-    return render_template(
-        "index.html",
-        mode=mode,
-        char=char,
-        result=result,
-        from_lang=from_lang,
-        to_lang=to_lang,
-        filter_common=filter_common
-    )
+        page_cache.put(key, (page, result if mode == "compare" else None))
+    if mode == "compare":
+        observe_result(result, from_lang, to_lang)
+    return page
+
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+
+@app.before_request
+def pin_engine():
+    reloader.start()
+    g.engine = reloader.current
+
+
+@app.after_request
+def report_data_version(response):
+    response.headers["X-Data-Version"] = current_engine().version
+    return response
+
+
+@app.after_request
+def record_request(response):
+    start = g.pop("start", None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or "unknown"
+    metrics.inc("pjk_requests_total", endpoint=endpoint, status=response.status_code)
+    metrics.observe("pjk_request_seconds", elapsed, endpoint=endpoint)
+    if SERVER_TIMING:
+        parts = [f"{stage};dur={t * 1000:.3f}" for stage, t in g.pop("timings", ())]
+        parts.append(f"total;dur={elapsed * 1000:.3f}")
+        response.headers["Server-Timing"] = ", ".join(parts)
+    return response
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus 文本格式"""
+    engine = current_engine()
+    for name, cache in (("result", result_cache), ("page", page_cache)):
+        # 命中 / 未命中数单调累计（换数据清空缓存时也不清零），照常作计数器导出
+        stats = cache.stats()
+        metrics.set("pjk_cache_hits_total", stats["hits"], cache=name)
+        metrics.set("pjk_cache_misses_total", stats["misses"], cache=name)
+        metrics.set("pjk_cache_entries", stats["size"], cache=name)
+    metrics.set("pjk_startup_seconds", STARTUP_SECONDS)
+    metrics.set("pjk_data_info", 1, version=engine.version, engine=engine.name)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/reload", methods=["POST"])
+def api_reload():
+    """
+    立即在后台重载数据（需设置 PJK_ADMIN_TOKEN，请求头 X-Admin-Token 与之相同）。
+    只作用于收到请求的 worker；其余 worker 会在轮询时发现新写出的快照。
+    wait=1 时同步重载并返回新版本。
+    """
+    if not ADMIN_TOKEN:
+        return api_error("未启用（未设置 PJK_ADMIN_TOKEN）", 403)
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        return api_error("无效的管理令牌", 403)
+    if request.args.get("wait") in ("1", "true"):
+        reloader.check(force=True)
+        status = reloader.status()
+        if status["last_error"]:
+            return jsonify({"error": "重载失败", **status}), 500
+        return jsonify(status)
+    reloader.request_reload()
+    return jsonify({"status": "reloading", **reloader.status()}), 202
+
+
+@app.route("/api/cache")
+def api_cache():
+    engine = current_engine()
+    return jsonify({
+        "engine": engine.name,
+        "data_version": engine.version,
+        "reload": reloader.status(),
+        "result_cache": result_cache.stats(),
+        "page_cache": page_cache.stats(),
+    })
 
 
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+# atomic.py
+# 原子写文件：先写同目录临时文件，成功后 os.replace 覆盖目标。
+# 中途失败或被中断时目标文件保持原样，不会留下写了一半的输出。
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="w", **kwargs):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
@@ -0,0 +1,273 @@
+# bench.py
+# 性能基准：查询引擎与数据流水线。
+# 每项基准在独立子进程中运行，记录耗时（多次取最小）与进程峰值内存（RSS），
+# 结果写入 JSON；若有基线文件则逐项对比，超出容差即以非零状态退出。
+#
+# 用法：
+#   python bench.py                       全部基准
+#   python bench.py startup snapshot      只跑指定基准（冷启动：import app 与读快照）
+#   python bench.py --save-baseline       把本次结果存为基线
+#   PJK_ENGINE=sqlite python bench.py     测 SQLite 引擎（环境变量会传给子进程）
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from atomic import atomic_write
+
+RESULTS_PATH = "bench_results.json"
+BASELINE_PATH = "bench_baseline.json"
+TOLERANCE = 0.20      # 允许比基线慢 / 多占内存 20%
+
+LANGS = ("普通话", "粤语", "广韵")
+
+# 流水线基准所需的源文件（复制/链接到临时目录里运行，不动仓库内的产物）
+PIPELINE_FILES = (
+    "kuankhiunn.sqlite", "Unihan_Variants.txt", "Unihan_Readings.txt", "list.tsv",
+    "CharFreq-Modern.xls", "charcount.csv", "guangyun_with_all_readings.csv",
+)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+@contextmanager
+def pipeline_workdir():
+    """在临时目录里运行流水线脚本：源文件用符号链接，输出写在临时目录"""
+    here = os.getcwd()
+    tmp = tempfile.mkdtemp(prefix="pjk-bench-")
+    try:
+        for name in PIPELINE_FILES:
+            if os.path.exists(name):
+                os.symlink(os.path.abspath(name), os.path.join(tmp, name))
+        os.chdir(tmp)
+        yield tmp
+    finally:
+        os.chdir(here)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ================================
+# 各项基准（在子进程中执行）：返回 {项目名 : 秒数}，无法运行时返回 None
+# ================================
+def bench_startup(repeat):
+    """import app：加载快照（或回退构建）并打开引擎；另记首次跨语言查询（要读入同音字表的一段）"""
+    start = time.perf_counter()
+    import app
+    timings = {"startup": time.perf_counter() - start}
+    start = time.perf_counter()
+    app.compare_pronunciations(app.engine, "普通话", "粤语", "東", False)
+    timings["startup.first_compare"] = time.perf_counter() - start
+    return timings
+
+
+def bench_snapshot(repeat):
+    """只读快照（引擎开张所需的部分：索引与字频表），不含 Flask 等的导入"""
+    import snapshot
+
+    def run():
+        dataset = snapshot.load_dataset()
+        dataset["indexes"], dataset["freq_table"]
+    return {"snapshot_load": best_of(run, repeat)}
+
+
+def bench_build_dataset(repeat):
+    """不用快照，从 CSV + 字频表构建全部索引"""
+    import snapshot
+    return {"build_dataset": best_of(snapshot.build_dataset, repeat)}
+
+
+def bench_lookup(repeat):
+    """逐字基础查询，覆盖表内全部字形"""
+    import app
+    glyphs = list(app.engine.dataset["indexes"]["glyph_rows"])
+
+    def run():
+        for g in glyphs:
+            app.engine.lookup(g)
+    return {"lookup": best_of(run, repeat)}
+
+
+def bench_compare(repeat):
+    """3×3 个方向 × 是否过滤常用字，覆盖表内全部字形（绕过结果缓存）"""
+    import app
+    glyphs = list(app.engine.dataset["indexes"]["glyph_rows"])
+    timings = {}
+    for from_lang in LANGS:
+        for to_lang in LANGS:
+            for filter_common in (False, True):
+                def run():
+                    for g in glyphs:
+                        app.compare_pronunciations(
+                            app.engine, from_lang, to_lang, g, filter_common
+                        )
+                name = f"compare[{from_lang}→{to_lang}{'，常用' if filter_common else ''}]"
+                timings[name] = best_of(run, repeat)
+    timings["compare[total]"] = sum(timings.values())
+    return timings
+
+
+def bench_convert(repeat):
+    import convert
+    with pipeline_workdir():
+        return {"pipeline.convert": best_of(convert.main, repeat)}
+
+
+def bench_full_table(repeat):
+    if not os.path.exists("Unihan_Readings.txt"):
+        return None
+    import get_full_table
+    with pipeline_workdir():
+        return {"pipeline.full_table": best_of(get_full_table.main, repeat)}
+
+
+def bench_freq(repeat):
+    try:
+        import get_freq
+    except ImportError:     # pandas / opencc 未安装
+        return None
+    with pipeline_workdir():
+        return {"pipeline.freq": best_of(get_freq.main, repeat)}
+
+
+BENCHMARKS = {
+    "startup": (bench_startup, 1),
+    "snapshot": (bench_snapshot, 5),
+    "build_dataset": (bench_build_dataset, 3),
+    "lookup": (bench_lookup, 3),
+    "compare": (bench_compare, 1),
+    "convert": (bench_convert, 3),
+    "full_table": (bench_full_table, 1),
+    "freq": (bench_freq, 1),
+}
+
+
+def run_child(name, repeat):
+    fn, default_repeat = BENCHMARKS[name]
+    # 流水线脚本会打印进度，统一转到 stderr，stdout 只留结果
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        timings = fn(repeat or default_repeat)
+    finally:
+        sys.stdout = stdout
+    print(json.dumps({"timings": timings, "peak_rss_mb": peak_rss_mb()}))
+
+
+# ================================
+# 汇总与对比
+# ================================
+def run_benchmark(name, repeat=None):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", name]
+    if repeat:
+        cmd += ["--repeat", str(repeat)]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"基准 {name} 运行失败：\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def collect(names, repeat=None):
+    results = {}
+    for name in names:
+        out = run_benchmark(name, repeat)
+        if out["timings"] is None:
+            print(f"⏭  {name}：缺少源文件或依赖，跳过")
+            continue
+        for item, seconds in out["timings"].items():
+            results[item] = {"seconds": seconds, "peak_rss_mb": out["peak_rss_mb"]}
+            print(f"  {item:<28}{seconds * 1000:10.1f} ms{out['peak_rss_mb']:9.1f} MB")
+    return results
+
+
+def compare_baseline(results, baseline, tolerance=TOLERANCE):
+    """→ [回退说明]；基线里没有的项目不比较"""
+    regressions = []
+    for item, now in results.items():
+        base = baseline.get(item)
+        if base is None:
+            continue
+        for metric, unit in (("seconds", "s"), ("peak_rss_mb", "MB")):
+            if base[metric] > 0 and now[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{item} {metric}: {base[metric]:.3f}{unit} → {now[metric]:.3f}{unit} "
+                    f"(+{now[metric] / base[metric] - 1:.0%})"
+                )
+    return regressions
+
+
+def write_json(obj, path):
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询引擎与数据流水线的性能基准")
+    parser.add_argument("names", nargs="*", help=f"要运行的基准（默认全部：{'、'.join(BENCHMARKS)}）")
+    parser.add_argument("--repeat", type=int, help="每项重复次数（取最小值）")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果存为基线")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.repeat)
+        return
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"❌ 未知基准：{'、'.join(unknown)}（可选：{'、'.join(BENCHMARKS)}）")
+
+    print(f"引擎：{os.environ.get('PJK_ENGINE', 'memory')}")
+    results = collect(names, args.repeat)
+    write_json({
+        "python": sys.version.split()[0],
+        "engine": os.environ.get("PJK_ENGINE", "memory"),
+        "results": results,
+    }, args.output)
+    print(f"✅ 结果已写入 {args.output}")
+
+    if args.save_baseline:
+        write_json(results, args.baseline)
+        print(f"✅ 已存为基线 {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"（没有基线文件 {args.baseline}，可用 --save-baseline 生成）")
+        return
+    regressions = compare_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"❌ 性能回退（容差 {args.tolerance:.0%}）：")
+        for line in regressions:
+            print(f"   {line}")
+        raise SystemExit(1)
+    print(f"✔ 与基线 {args.baseline} 相比无回退（容差 {args.tolerance:.0%}）")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
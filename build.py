@@ -0,0 +1,164 @@
+# build.py
+# 数据构建总入口：convert.py / get_full_table.py → get_freq.py → 快照。
+# （get_full_table.py 直接读 kuankhiunn.sqlite，kuankhiunn_guangyun.csv 只是单独导出的中间表；
+#   异体字不再复制成行，由 convert.py 另出 variant_aliases.json）
+# 各阶段按输入 / 输出文件组成依赖图；输入内容（sha1）与上次相同且输出未被改动的阶段直接跳过，
+# 上游重跑但输出字节未变时，下游也照样跳过。各脚本均以原子方式写出结果。
+#
+# 用法：
+#   python build.py                 构建全部过期阶段
+#   python build.py snapshot        只构建 snapshot 及其过期的上游
+#   python build.py --force ...     忽略记录，强制重跑
+#   python build.py --dry-run       只列出将要执行的阶段
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+from atomic import atomic_write
+from snapshot import file_digest
+
+STATE_PATH = ".build_state.json"
+
+# 阶段按拓扑顺序排列；脚本自身也算输入，代码改动同样触发重建
+STAGES = [
+    {
+        "name": "convert",
+        "module": "convert",
+        "inputs": ["convert.py", "unihan.py", "kuankhiunn.sqlite", "Unihan_Variants.txt"],
+        "outputs": ["kuankhiunn_guangyun.csv", "variant_aliases.json"],
+    },
+    {
+        "name": "full_table",
+        "module": "get_full_table",
+        "inputs": ["get_full_table.py", "convert.py", "unihan.py", "kuankhiunn.sqlite",
+                   "Unihan_Readings.txt", "list.tsv"],
+        "outputs": ["guangyun_with_all_readings.csv"],
+    },
+    {
+        "name": "freq",
+        "module": "get_freq",
+        "inputs": ["get_freq.py", "freq_table.py", "CharFreq-Modern.xls", "charcount.csv",
+                   "guangyun_with_all_readings.csv"],
+        "outputs": ["freq_table.json"],
+    },
+    {
+        "name": "snapshot",
+        "module": "snapshot",
+        "inputs": ["snapshot.py", "query.py", "model.py", "homophone_map.py",
+                   "reading_search.py", "category_search.py", "correspondence.py",
+                   "fanqie.py", "near_search.py", "freq_table.py",
+                   "guangyun_with_all_readings.csv", "freq_table.json", "list.tsv",
+                   "variant_aliases.json"],
+        "outputs": ["guangyun.snapshot"],
+    },
+]
+
+
+# ================================
+# 依赖图
+# ================================
+def upstream(stage, stages=STAGES):
+    """直接上游：产出本阶段某个输入的阶段"""
+    producers = {out: s["name"] for s in stages for out in s["outputs"]}
+    return {producers[p] for p in stage["inputs"] if p in producers}
+
+
+def select(targets, stages=STAGES):
+    """目标阶段及其全部上游（保持拓扑顺序）"""
+    if not targets:
+        return list(stages)
+    by_name = {s["name"]: s for s in stages}
+    unknown = [t for t in targets if t not in by_name]
+    if unknown:
+        raise SystemExit(f"❌ 未知阶段：{'、'.join(unknown)}（可选：{'、'.join(by_name)}）")
+    wanted = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(upstream(by_name[name], stages))
+    return [s for s in stages if s["name"] in wanted]
+
+
+# ================================
+# 状态记录
+# ================================
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def digests(paths):
+    return {p: file_digest(p) for p in paths}
+
+
+def is_fresh(stage, record, input_digests):
+    if not record or record.get("inputs") != input_digests:
+        return False
+    for out, digest in record.get("outputs", {}).items():
+        if not os.path.exists(out) or file_digest(out) != digest:
+            return False
+    return set(record.get("outputs", {})) == set(stage["outputs"])
+
+
+# ================================
+# 执行
+# ================================
+def run_stage(stage):
+    module = importlib.import_module(stage["module"])
+    module.main()
+
+
+def build(targets=(), force=False, dry_run=False, stages=STAGES):
+    state = load_state()
+    for stage in select(targets, stages):
+        name = stage["name"]
+        missing = [p for p in stage["inputs"] if not os.path.exists(p)]
+        if missing:
+            if all(os.path.exists(p) for p in stage["outputs"]):
+                print(f"⚠️ [{name}] 缺少输入 {'、'.join(missing)}，沿用现有输出")
+                continue
+            raise SystemExit(f"❌ [{name}] 缺少输入 {'、'.join(missing)}，且没有现成输出可用")
+
+        input_digests = digests(stage["inputs"])
+        if not force and is_fresh(stage, state.get(name), input_digests):
+            print(f"⏭  [{name}] 输入未变，跳过")
+            continue
+        if dry_run:
+            print(f"▶  [{name}] 将重新构建")
+            continue
+
+        print(f"▶  [{name}] 构建中…")
+        start = time.perf_counter()
+        run_stage(stage)
+        state[name] = {
+            "inputs": input_digests,
+            "outputs": digests(stage["outputs"]),
+        }
+        save_state(state)
+        print(f"✔  [{name}] 完成（{time.perf_counter() - start:.2f}s）")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="增量构建广韵 / 读音 / 字频数据")
+    parser.add_argument("targets", nargs="*", help="要构建的阶段（默认全部）")
+    parser.add_argument("--force", action="store_true", help="忽略记录，强制重跑")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将要执行的阶段")
+    args = parser.parse_args(argv)
+    build(args.targets, force=args.force, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,219 @@
+# bulk.py
+# 批量查询：从文件或 stdin 读入字 / 整段文本，对每个字做基础查询和 / 或任意方向的音韵映射，
+# 结果以 JSONL 或 CSV 流式写到 stdout。
+#   * 数据只加载一次（预编译快照），同一个字只算一次，之后直接复用输出行
+#   * 新字较多时分给进程池计算（子进程各自载入快照），输出顺序与输入一致
+#
+# 用法：
+#   python bulk.py corpus.txt --lookup --directions 普通话→粤语,粤语→广韵 > out.jsonl
+#   cat chars.txt | python bulk.py --directions 普通话→广韵 --format csv
+# search_character.py --batch 与 compare_pronunciation.py --batch 也走这里。
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from annotate import iter_text
+from engine import MemoryEngine, open_engine
+from model import COLUMNS
+from query import LANG_MAP
+from snapshot import load_dataset
+
+CHUNK_CHARS = 1 << 16          # 每块字数
+PARALLEL_MIN_CHARS = 2048      # 一块里新字达到这么多才动用进程池
+
+_engine = None
+_tasks = None
+
+
+# ================================
+# 单字
+# ================================
+def compare_char(engine, from_lang, to_lang, char, filter_common=False):
+    readings = engine.readings(char, LANG_MAP[from_lang])
+    if not readings:
+        return {"error": f"未找到「{char}」的 {from_lang} 读音"}
+    return engine.compare_readings(from_lang, to_lang, readings, filter_common)
+
+
+def query_char(engine, char, tasks):
+    """→ {"char": 字, "lookup": [...], "普通话→粤语": {...}, ...}"""
+    out = {"char": char}
+    if tasks["lookup"]:
+        out["lookup"] = [dict(r) for r in engine.lookup(char)]
+    for from_lang, to_lang in tasks["directions"]:
+        out[f"{from_lang}→{to_lang}"] = compare_char(
+            engine, from_lang, to_lang, char, tasks["filter_common"]
+        )
+    return out
+
+
+# ================================
+# 输出格式
+# ================================
+def csv_header(tasks):
+    header = ["char"]
+    if tasks["lookup"]:
+        header += [c for c in COLUMNS if c != "glyph"]
+    for from_lang, to_lang in tasks["directions"]:
+        d = f"{from_lang}→{to_lang}"
+        header += [f"{d} 读音", f"{d} 同音字", f"{d} 对应"]
+    return header
+
+
+def csv_row(item, tasks):
+    row = [item["char"]]
+    if tasks["lookup"]:
+        # 多条记录各列以换行分隔
+        row += ["\n".join(r[c] for r in item["lookup"]) for c in COLUMNS if c != "glyph"]
+    for from_lang, to_lang in tasks["directions"]:
+        result = item[f"{from_lang}→{to_lang}"]
+        if "error" in result:
+            row += ["", "", ""]
+            continue
+        groups = result.get("groups_folded") or {
+            k: "".join(v) for k, v in result.get("groups", {}).items()
+        }
+        row += [
+            "；".join(result["readings"]),
+            "".join(result["same_sound"]),
+            "\n".join(f"{k}：{v}" for k, v in groups.items()),
+        ]
+    return row
+
+
+def format_item(item, tasks):
+    if tasks["format"] == "csv":
+        buf = io.StringIO()
+        csv.writer(buf).writerow(csv_row(item, tasks))
+        return buf.getvalue()
+    return json.dumps(item, ensure_ascii=False) + "\n"
+
+
+def _init_worker(engine_name, tasks):
+    """进程池子进程：打开与主进程同类的引擎，记下任务设置（不依赖 fork 继承全局变量）"""
+    global _engine, _tasks
+    _engine = open_engine(engine_name)
+    _tasks = tasks
+
+
+def format_chars(chars, engine=None, tasks=None):
+    """若干个（互不相同的）字 → [输出行]"""
+    engine = engine or _engine
+    tasks = tasks or _tasks
+    return [format_item(query_char(engine, ch, tasks), tasks) for ch in chars]
+
+
+# ================================
+# 输入与调度
+# ================================
+def iter_chunks(stream, unique=False):
+    """二进制流 → 字块（跳过空白；unique 时每个字只出现一次）"""
+    seen = set()
+    buf = []
+    for text in iter_text(stream):
+        for ch in text:
+            if ch.isspace():
+                continue
+            if unique:
+                if ch in seen:
+                    continue
+                seen.add(ch)
+            buf.append(ch)
+            if len(buf) >= CHUNK_CHARS:
+                yield buf
+                buf = []
+    if buf:
+        yield buf
+
+
+def run(stream, out, tasks, workers=None, unique=False, engine=None):
+    """
+    逐块处理：块内新出现的字才需要计算（结果按字缓存），其余直接复用；
+    新字较多时分给进程池并行计算，输出仍由主进程按输入顺序写出。
+    """
+    global _engine, _tasks
+    _engine = engine or _engine or MemoryEngine(load_dataset())
+    _tasks = tasks
+    workers = workers or os.cpu_count() or 1
+
+    if tasks["format"] == "csv":
+        csv.writer(out).writerow(csv_header(tasks))
+
+    memo = {}
+    pool = None
+    try:
+        for chunk in iter_chunks(stream, unique):
+            new = [ch for ch in dict.fromkeys(chunk) if ch not in memo]
+            if workers > 1 and len(new) >= PARALLEL_MIN_CHARS:
+                if pool is None:
+                    # spawn / forkserver 启动时子进程看不到主进程的全局变量，由 initializer 设定
+                    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                               initargs=(_engine.name, tasks))
+                size = -(-len(new) // workers)
+                parts = [new[i:i + size] for i in range(0, len(new), size)]
+                lines = [line for part in pool.map(format_chars, parts) for line in part]
+            else:
+                lines = format_chars(new)
+            memo.update(zip(new, lines))
+            out.write("".join(memo[ch] for ch in chunk))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def parse_directions(value):
+    """"普通话→粤语,粤语→广韵" → [("普通话", "粤语"), ("粤语", "广韵")]"""
+    directions = []
+    for d in filter(None, (value or "").split(",")):
+        parts = d.replace("->", "→").split("→")
+        if len(parts) != 2 or parts[0] not in LANG_MAP or parts[1] not in LANG_MAP:
+            raise SystemExit(f"❌ 无效方向：{d}（可选语言：普通话、粤语、广韵）")
+        directions.append((parts[0], parts[1]))
+    return directions
+
+
+def add_arguments(parser):
+    parser.add_argument("input", nargs="?", help="输入文件（默认 stdin）")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--workers", type=int, help="进程数（默认全部 CPU；新字不多时仍单进程）")
+    parser.add_argument("--unique", action="store_true", help="每个字只输出一次")
+    parser.add_argument("--filter-common", action="store_true", help="同音字只保留常用字")
+
+
+def main(argv=None, lookup=None, directions=None):
+    parser = argparse.ArgumentParser(description="批量查询，结果以 JSONL / CSV 输出到 stdout")
+    add_arguments(parser)
+    if lookup is None:
+        parser.add_argument("--lookup", action="store_true", help="输出基础查询结果")
+    if directions is None:
+        parser.add_argument("--directions", default="",
+                            help="音韵映射方向，逗号分隔，如 普通话→粤语,粤语→广韵")
+    args = parser.parse_args(argv)
+
+    tasks = {
+        "lookup": lookup if lookup is not None else args.lookup,
+        "directions": parse_directions(directions if directions is not None else args.directions),
+        "filter_common": args.filter_common,
+        "format": args.format,
+    }
+    if not tasks["lookup"] and not tasks["directions"]:
+        parser.error("至少要指定 --lookup 或 --directions")
+
+    out = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="")
+    try:
+        if args.input:
+            with open(args.input, "rb") as f:
+                run(f, out, tasks, args.workers, args.unique)
+        else:
+            run(sys.stdin.buffer, out, tasks, args.workers, args.unique)
+    finally:
+        out.flush()
+        out.detach()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,216 @@
+# category_search.py
+# 按中古音韵地位查字（声母 / 呼 / 等 / 声调 / 韵，另可按组、摄归并）：
+#   * 广韵信息每行为 声母 + 呼 + 等 + 声调 + 韵（见 convert.BASE_SQL，前四项各一字），
+#     建快照时拆成结构化的列，每个音节（字 × 地位）占一个位置
+#   * 每个属性值一张位图（Python 整数，第 p 位表示第 p 个音节），多条件即按位与
+#   * 同一属性内的多个值取并集，不同属性取交集；条件都落在同一个音节上，
+#     多音字不会因不同读音各满足一部分条件而误中
+from array import array
+
+from query import LANG_MAP, group_by_reading
+
+ATTRS = ("声母", "呼", "等", "声调", "韵")
+
+# 查询用的英文参数名（API / 命令行均可用中文名或英文名）
+ATTR_KEYS = {
+    "initial": "声母",
+    "openness": "呼",
+    "grade": "等",
+    "tone": "声调",
+    "rhyme": "韵",
+    "she": "摄",
+}
+
+INITIAL_GROUPS = {
+    "幫組": "幫滂並明",
+    "端組": "端透定泥",
+    "知組": "知徹澄娘",
+    "精組": "精清從心邪",
+    "莊組": "莊初崇生俟",
+    "章組": "章昌船書常",
+    "見組": "見溪群疑",
+    "影組": "影曉匣云以",
+}
+
+# 摄 → 韵（韵以平声韵目统摄上去入）
+SHE = {
+    "通": "東冬鍾",
+    "江": "江",
+    "止": "支脂之微",
+    "遇": "魚虞模",
+    "蟹": "齊佳皆灰咍祭泰夬廢",
+    "臻": "眞諄臻文欣魂痕",
+    "山": "元寒桓刪山先仙",
+    "效": "蕭宵肴豪",
+    "果": "歌戈",
+    "假": "麻",
+    "宕": "陽唐",
+    "梗": "庚耕清青",
+    "曾": "蒸登",
+    "流": "尤侯幽",
+    "深": "侵",
+    "咸": "覃談鹽添咸銜嚴凡",
+}
+
+# 各属性取值的传统顺序（韵按所属摄排列，重纽 A / B 随其韵目）；表中有而此处未列的值排在最后
+VALUE_ORDER = {
+    "声母": "".join(INITIAL_GROUPS.values()) + "來日",
+    "呼": "開合",
+    "等": "一二三四",
+    "声调": "平上去入",
+    "韵": "".join(SHE.values()),
+}
+
+
+def value_key(attr, value):
+    order = VALUE_ORDER[attr]
+    k = order.find(value[0])
+    return k if k >= 0 else len(order), value
+
+
+# 简体 / 通行写法 → 表中用字
+VALUE_FORMS = {
+    "开": "開", "组": "組",
+    "帮": "幫", "并": "並", "庄": "莊", "书": "書", "从": "從", "来": "來",
+    "彻": "徹", "见": "見", "晓": "曉",
+    "东": "東", "钟": "鍾", "鱼": "魚", "齐": "齊", "废": "廢", "真": "眞",
+    "谆": "諄", "删": "刪", "萧": "蕭", "阳": "陽", "谈": "談", "盐": "鹽",
+    "衔": "銜", "严": "嚴",
+}
+
+
+def parse_info(line):
+    """"端開一平東" → ("端", "開", "一", "平", "東")；重纽韵带 A / B，如 "支A" """
+    return line[0], line[1], line[2], line[3], line[4:]
+
+
+# ================================
+# 构建
+# ================================
+def build_category_index(indexes):
+    """
+    返回 {
+        "rows":    array，第 p 个音节所在的行号,
+        "values":  {属性 : [值]}（按 VALUE_ORDER 的传统顺序）,
+        "columns": {属性 : array}，第 p 个音节该属性的值序号,
+        "bitmaps": {属性 : {值 : 位图}},
+    }
+    """
+    store = indexes["rows"]
+    guangyun = store.columns["guangyun"]
+    names = store.lines.names
+
+    rows = array("I")
+    parsed = []
+    for i in range(len(store)):
+        for lid in guangyun[i]:
+            rows.append(i)
+            parsed.append(parse_info(names[lid]))
+
+    values, columns, bitmaps = {}, {}, {}
+    for k, attr in enumerate(ATTRS):
+        vals = sorted({p[k] for p in parsed}, key=lambda v: value_key(attr, v))
+        ids = {v: j for j, v in enumerate(vals)}
+        column = array("H", (ids[p[k]] for p in parsed))
+        bits = [bytearray((len(parsed) + 7) // 8) for _ in vals]
+        for pos, j in enumerate(column):
+            bits[j][pos >> 3] |= 1 << (pos & 7)
+        values[attr] = vals
+        columns[attr] = column
+        bitmaps[attr] = {v: int.from_bytes(b, "little") for v, b in zip(vals, bits)}
+
+    return {"rows": rows, "values": values, "columns": columns, "bitmaps": bitmaps}
+
+
+# ================================
+# 查询
+# ================================
+def expand_value(index, attr, value):
+    """条件值 → 表中的值列表（组 / 摄名展开，简体写法归并，"支" 兼含 支A / 支B）"""
+    value = value.strip()
+    if attr == "摄":
+        return [v for v in index["values"]["韵"] if v[0] in SHE.get(value.rstrip("摄攝"), "")]
+    value = "".join(VALUE_FORMS.get(ch, ch) for ch in value)
+    if attr == "声母":
+        if value in INITIAL_GROUPS:
+            return list(INITIAL_GROUPS[value])
+        value = value.rstrip("母")
+    elif attr == "声调":
+        value = value.rstrip("声聲")
+    elif attr == "呼":
+        value = value.rstrip("口")
+    elif attr == "等":
+        value = value.rstrip("等")
+    known = index["values"][attr]
+    if attr == "韵" and value not in known:
+        return [v for v in known if v[:-1] == value and v[-1] in "AB"]
+    return [value] if value in known else []
+
+
+def parse_conditions(params):
+    """
+    {参数名 : "值,值"} → {属性 : [条件值]}，参数名可为中文属性名或 ATTR_KEYS 中的英文名；
+    未知的参数名忽略，值为空的条件忽略。
+    """
+    conds = {}
+    for key, raw in params.items():
+        attr = ATTR_KEYS.get(key, key)
+        if attr not in ATTRS and attr != "摄":
+            continue
+        vals = [v for v in str(raw).replace("，", ",").split(",") if v.strip()]
+        if vals:
+            conds.setdefault(attr, []).extend(vals)
+    return conds
+
+
+def match_bitmap(index, conds):
+    """条件 → 命中音节的位图；某个条件值无法识别时抛出 ValueError"""
+    result = None
+    for attr, vals in conds.items():
+        column = "韵" if attr == "摄" else attr
+        bitmaps = index["bitmaps"][column]
+        union = 0
+        for value in vals:
+            expanded = expand_value(index, attr, value)
+            if not expanded:
+                raise ValueError(f"无效的{attr}：{value}")
+            for v in expanded:
+                union |= bitmaps[v]
+        result = union if result is None else result & union
+    return result or 0
+
+
+def iter_positions(bitmap):
+    """位图 → 置位的音节位置（升序）"""
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for byte_no, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield (byte_no << 3) + low.bit_length() - 1
+            byte ^= low
+
+
+def category_hits(index, conds):
+    """满足全部条件的 {行号 : [命中的音韵地位 {属性 : 值}]}（按原表行序）"""
+    rows, values, columns = index["rows"], index["values"], index["columns"]
+    hits = {}
+    for p in iter_positions(match_bitmap(index, conds)):
+        hits.setdefault(rows[p], []).append(
+            {attr: values[attr][columns[attr][p]] for attr in ATTRS}
+        )
+    return hits
+
+
+def search_categories(index, indexes, conds):
+    """
+    满足全部条件的字及其命中的音韵地位（按原表行序）：
+      [{"glyph": 字, "status": [{属性 : 值}, ...]}]
+    """
+    glyphs = indexes["rows"].glyphs
+    return [{"glyph": glyphs[i], "status": status}
+            for i, status in category_hits(index, conds).items()]
+
+
+def category_breakdown(indexes, glyphs, systems):
+    """{系统 : {读音 : [字]}}：命中字在普通话 / 粤语下的读音分布"""
+    return {s: group_by_reading(indexes, glyphs, LANG_MAP[s]) for s in systems}
@@ -1,16 +1,26 @@
 # convert.py
 import sqlite3, csv
-import re
+import json
+
+from atomic import atomic_write
+import unihan
 
 DB = "kuankhiunn.sqlite"
 OUT = "kuankhiunn_guangyun.csv"
+UNIHAN_VARIANTS = "Unihan_Variants.txt"
+ALIASES_OUT = "variant_aliases.json"
+
+ALIAS_FIELDS = ("kTraditionalVariant", "kSimplifiedVariant", "kZVariant", "kSemanticVariant")
 
-conn = sqlite3.connect(DB)
-cursor = conn.cursor()
+FIELDNAMES = [
+    "glyph", "unicode",
+    "sjeng", "xu", "hey", "tonk", "dew",
+    "polyhedron中古全拼", "fanqie"
+]
 
 # 反切直接来自 syllables.cet；romA 是 Polyhedron 中古全拼
-query = """
-SELECT 
+QUERY = """
+SELECT
     k.glyph,
     s.sjeng,
     s.xu,
@@ -24,85 +34,142 @@ JOIN syllables AS s ON k.cet = s.cet
 WHERE k.glyph IS NOT NULL
 """
 
-rows = cursor.execute(query).fetchall()
-conn.close()
 
-with open(OUT, "w", encoding="utf-8-sig", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow([
-        "glyph", "unicode",
-        "sjeng", "xu", "hey", "tonk", "dew",
-        "polyhedron中古全拼", "fanqie"
-    ])
+# ================================
+# 直接在 SQLite 内完成 JOIN + 简体扩展 + 按字聚合（不经中间 CSV）
+# ================================
+# base：JOIN 结果（rowid 即原查询的行序）；广韵信息顺序 sjeng + xu + tonk + dew + hey
+BASE_SQL = """
+CREATE TEMP TABLE base (glyph TEXT, info TEXT, fanqie TEXT, roma TEXT);
+INSERT INTO temp.base
+SELECT
+    k.glyph,
+    trim(coalesce(s.sjeng, '') || coalesce(s.xu, '') || coalesce(s.tonk, '')
+         || coalesce(s.dew, '') || coalesce(s.hey, '')),
+    trim(coalesce(s.cet, '')),
+    trim(coalesce(s.romA, ''))
+FROM kuankhiunn AS k
+JOIN syllables AS s ON k.cet = s.cet
+WHERE k.glyph IS NOT NULL AND length(k.glyph) = 1;
+"""
+
+# 同字多地位去重后按 (广韵信息, 反切, 全拼) 排序，各列分别拼接（空值不占行）；
+# 字按在原查询中首次出现的顺序排列。group_concat 用窗口函数以保证拼接顺序。
+# 简体等异体不再复制成独立的行，改由 build_aliases 生成的别名表在查询时归并。
+GROUPED_SQL = """
+WITH triples AS (
+    SELECT glyph, min(rowid) AS ord, info, fanqie, roma
+    FROM temp.base
+    GROUP BY glyph, info, fanqie, roma
+),
+cells AS (
+    SELECT
+        glyph,
+        min(ord) OVER w AS ord,
+        group_concat(nullif(info, ''), char(10)) OVER w AS info,
+        group_concat(nullif(fanqie, ''), char(10)) OVER w AS fanqie,
+        group_concat(nullif(roma, ''), char(10)) OVER w AS roma,
+        row_number() OVER w AS n
+    FROM triples
+    WINDOW w AS (
+        PARTITION BY glyph ORDER BY info, fanqie, roma
+        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+    )
+)
+SELECT glyph, printf('U+%04X', unicode(glyph)),
+       coalesce(info, ''), coalesce(fanqie, ''), coalesce(roma, '')
+FROM cells
+WHERE n = 1
+ORDER BY ord
+"""
+
+
+def iter_glyph_cells(db=DB):
+    """逐字产出 (字, U+XXXX, 广韵信息, 反切, 中古全拼)，同字多地位以 \n 分隔、多行对齐"""
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        conn.executescript(BASE_SQL)
+        yield from conn.execute(GROUPED_SQL)
+    finally:
+        conn.close()
+
+
+def export_guangyun(db=DB):
+    """广韵字表 JOIN 音节表 → [行 dict]（空值记为空串，与写出再读回的 CSV 一致）"""
+    conn = sqlite3.connect(db)
+    cursor = conn.cursor()
+    rows = cursor.execute(QUERY).fetchall()
+    conn.close()
+
+    out = []
     skipped = 0
     for glyph, sjeng, xu, hey, tonk, dew, romA, fanqie in rows:
-        try:
-            if not glyph or len(glyph) != 1:
-                skipped += 1
-                continue
-            unicode_hex = f"U+{ord(glyph):04X}"
-            writer.writerow([glyph, unicode_hex, sjeng, xu, hey, tonk, dew, romA or "", fanqie or ""])
-        except Exception:
+        if not glyph or len(glyph) != 1:
             skipped += 1
             continue
-
-def load_unihan_variants(path):
-    trad2simp = {}
-    pattern = re.compile(r"U\+([0-9A-F]{4,5})")
-
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.startswith("U+") or "kSimplifiedVariant" not in line:
-                continue
-            parts = line.strip().split("\t")
-            if len(parts) < 3:
-                continue
-            trad_code = parts[0]
-            variants = parts[2]
-            trad_match = pattern.match(trad_code)
-            if not trad_match:
-                continue
-            trad_char = chr(int(trad_match.group(1), 16))
-            simp_codes = pattern.findall(variants)
-            if simp_codes:
-                simp_char = chr(int(simp_codes[0], 16))
-                trad2simp[trad_char] = simp_char
-    return trad2simp
-
-
-def load_csv(path):
-    with open(path, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-    return rows, reader.fieldnames
-
-
-def augment_with_simplified(csv_path, unihan_path):
-    trad2simp = load_unihan_variants(unihan_path)
-    rows, fieldnames = load_csv(csv_path)
-
-    # 建立繁体 → [多行记录] 对应表
-    trad_map = {}
-    for row in rows:
-        trad_map.setdefault(row["glyph"], []).append(row)
-
-    added = 0
-    new_rows = rows.copy()
-
-    for trad, simp in trad2simp.items():
-        if trad in trad_map and simp != trad and len(simp) == 1:
-            for base_row in trad_map[trad]:
-                new_row = base_row.copy()
-                new_row["glyph"] = simp
-                new_row["unicode"] = f"U+{ord(simp):04X}"
-                new_rows.append(new_row)
-                added += 1
-
-    # === Step 4: 写回 CSV ===
-    with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+        unicode_hex = f"U+{ord(glyph):04X}"
+        values = [glyph, unicode_hex, sjeng, xu, hey, tonk, dew, romA or "", fanqie or ""]
+        out.append({
+            k: "" if v is None else str(v)
+            for k, v in zip(FIELDNAMES, values)
+        })
+    return out
+
+
+def build_aliases(glyphs, unihan_path=UNIHAN_VARIANTS):
+    """
+    异体字 → 表内对应字（字符串），按优先级只取第一个有表内字的层级：
+      1. 以它为 kSimplifiedVariant 的繁体字（即原先复制简体行的来源）
+      2. 它的 kTraditionalVariant / kSimplifiedVariant
+      3. 它的 kZVariant / kSemanticVariant
+    表内的字只收第 1 层（如 只 → 隻），查询时与其自身的记录合并。
+    有第 1 层的字读音与原先把繁体行复制给简体字时一致。Unihan_Variants.txt 只读一遍。
+    """
+    glyphs = set(glyphs)
+    links = unihan.parse_variant_links(unihan_path)
+
+    # 繁体 → 简体取 kSimplifiedVariant 的第一个码位（同原先复制简体行的规则）
+    sources = {}
+    for trad, fields in links.items():
+        simp = fields.get("kSimplifiedVariant")
+        if trad in glyphs and simp and simp[0] != trad:
+            sources.setdefault(simp[0], []).append(trad)
+
+    aliases = {}
+    for ch in sorted(set(sources) | set(links)):
+        tiers = [sources.get(ch, ())]
+        if ch not in glyphs:
+            fields = links.get(ch, {})
+            tiers += [[t for key in keys for t in fields.get(key, ())]
+                      for keys in (ALIAS_FIELDS[:2], ALIAS_FIELDS[2:])]
+        for tier in tiers:
+            targets = "".join(dict.fromkeys(t for t in tier if t in glyphs and t != ch))
+            if targets:
+                aliases[ch] = targets
+                break
+    return aliases
+
+
+def write_aliases(aliases, path=ALIASES_OUT):
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        json.dump(aliases, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_csv(rows, path, fieldnames=FIELDNAMES):
+    with atomic_write(path, "w", encoding="utf-8-sig", newline="") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
-        writer.writerows(new_rows)
+        writer.writerows(rows)
+
+
+def main(db=DB, unihan_path=UNIHAN_VARIANTS, out=OUT):
+    # 一次生成、一次写出；简体等异体不再复制成行，另写别名表（表内简体字亦收其繁体来源）
+    rows = export_guangyun(db)
+    write_csv(rows, out)
+    aliases = build_aliases({r["glyph"] for r in rows}, unihan_path)
+    write_aliases(aliases)
+    print(f"✅ 已生成 {out}（{len(rows)} 行）与 {ALIASES_OUT}（{len(aliases)} 个异体）")
 
 
-augment_with_simplified(csv_path="kuankhiunn_guangyun.csv",unihan_path="Unihan_Variants.txt")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
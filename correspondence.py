@@ -0,0 +1,200 @@
+# correspondence.py
+# 中古音韵地位 × 现代读音成分 的对应统计（列联表），如 中古声调 × 粤语声调、中古声母 × 普通话声母。
+#   * 建快照时把每个字的 中古音节 × 现代读音 组合编码成整数数组（各属性值的序号），
+#     再用 numpy 按格子号一次性累加（bincount）出全部列联表，查询时只需按需截取、归一化
+#   * 行列按传统顺序排列：中古各属性沿用 category_search 的取值顺序（平上去入、幫滂並明……）
+#   * 一字有 m 个中古地位、n 个现代读音时无从判断谁对应谁，每个组合计 1/(m·n)，
+#     使每字总权重为 1；另有按字频加权、只计单地位单读音字 两种计数
+# 用法：python correspondence.py 声调 粤语 tone [--weight freq] [--normalize row]
+import sys
+from array import array
+
+from category_search import ATTRS
+from model import READING_ATTRS
+from query import LANG_MAP
+
+PARTS = ("initial", "final", "tone")
+PART_NAMES = {"initial": "声母", "final": "韵母", "tone": "声调"}
+LANGS = ("普通话", "粤语")
+WEIGHTS = ("glyphs", "freq", "unambiguous")
+NORMALIZE = ("row", "col", "all")
+
+
+# ================================
+# 构建
+# ================================
+def reading_parts(search, col):
+    """{读音 ID : (声母, 韵母, 声调)}：取自 reading_search 的分解索引（零声母记作 "_"）"""
+    parts = {}
+    for k, part in enumerate(PARTS):
+        for value, rids in search[col][part].items():
+            for rid in rids:
+                parts.setdefault(rid, [None] * len(PARTS))[k] = value or "_"
+    return {rid: tuple(p) for rid, p in parts.items() if None not in p}
+
+
+def encode_pairs(indexes, categories, search, lang, freq):
+    """
+    把某一现代语言下全部 (中古音节, 现代读音) 组合编码成整数数组：
+      mc[属性]   中古属性值序号      modern[成分]  现代成分值序号
+      weight     1/(m·n)             freq_weight   1/(m·n) × 该字字频
+      single     是否为单地位单读音字（0 / 1）
+    另返回各现代成分的取值表。
+    """
+    store = indexes["rows"]
+    column = store.columns[READING_ATTRS[LANG_MAP[lang]]]
+    parts = reading_parts(search, LANG_MAP[lang])
+
+    positions = {}
+    for p, i in enumerate(categories["rows"]):
+        positions.setdefault(i, []).append(p)
+
+    values = {part: sorted({rp[k] for rp in parts.values()}) for k, part in enumerate(PARTS)}
+    ids = {part: {v: j for j, v in enumerate(vals)} for part, vals in values.items()}
+
+    mc = {attr: array("H") for attr in ATTRS}
+    modern = {part: array("H") for part in PARTS}
+    weight, freq_weight, single = array("d"), array("d"), array("B")
+    for i, ps in positions.items():
+        rids = [rid for rid in column[i] if rid in parts]
+        if not rids:
+            continue
+        w = 1 / (len(ps) * len(rids))
+        f = w * freq.get(store.glyphs[i], 0)
+        s = len(ps) == 1 and len(rids) == 1
+        for p in ps:
+            for rid in rids:
+                for attr in ATTRS:
+                    mc[attr].append(categories["columns"][attr][p])
+                for k, part in enumerate(PARTS):
+                    modern[part].append(ids[part][parts[rid][k]])
+                weight.append(w)
+                freq_weight.append(f)
+                single.append(s)
+    return {"mc": mc, "modern": modern, "weight": weight,
+            "freq": freq_weight, "single": single}, values
+
+
+def build_correspondence(indexes, categories, search, mandarin_freq, cantonese_freq):
+    """
+    返回 {
+        "mc_values":     {中古属性 : [值]},
+        "modern_values": {语言 : {成分 : [值]}},
+        "tables":        {(中古属性, 语言, 成分) : {计数方式 : array（行优先的 行×列 矩阵）}},
+    }
+    """
+    # numpy 只在建快照时用到，查询（contingency）不需要，不拖慢 worker 启动
+    import numpy as np
+
+    freqs = {"普通话": mandarin_freq, "粤语": cantonese_freq}
+    mc_values = categories["values"]
+    modern_values, tables = {}, {}
+    for lang in LANGS:
+        pairs, values = encode_pairs(indexes, categories, search, lang, freqs[lang])
+        modern_values[lang] = values
+        counts = {"glyphs": np.frombuffer(pairs["weight"]),
+                  "freq": np.frombuffer(pairs["freq"]),
+                  "unambiguous": np.frombuffer(pairs["single"], dtype=np.uint8).astype(np.float64)}
+        for attr in ATTRS:
+            rows = np.frombuffer(pairs["mc"][attr], dtype=np.uint16).astype(np.intp)
+            for part in PARTS:
+                cols = np.frombuffer(pairs["modern"][part], dtype=np.uint16)
+                ncols = len(values[part])
+                size = len(mc_values[attr]) * ncols
+                cells = rows * ncols + cols
+                tables[(attr, lang, part)] = {
+                    name: array("d", np.bincount(cells, weights=ws, minlength=size).tobytes())
+                    for name, ws in counts.items()
+                }
+    return {"mc_values": mc_values, "modern_values": modern_values, "tables": tables}
+
+
+# ================================
+# 查询
+# ================================
+def contingency(corr, mc_attr, lang, part, weight="glyphs", normalize=None):
+    """
+    列联表：{"rows": 中古值, "cols": 现代值, "counts": [[...]], "row_totals", "col_totals", "total"}
+    全零的行 / 列省略；normalize=row | col | all 时 counts 改为相应的比例（合计仍为原计数）。
+    参数无效时抛出 ValueError。
+    """
+    if mc_attr not in ATTRS:
+        raise ValueError(f"无效的中古属性：{mc_attr}（可选：{'、'.join(ATTRS)}）")
+    if lang not in LANGS:
+        raise ValueError(f"无效的语言：{lang}（可选：{'、'.join(LANGS)}）")
+    part = {v: k for k, v in PART_NAMES.items()}.get(part, part)
+    if part not in PARTS:
+        raise ValueError(f"无效的读音成分：{part}（可选：initial、final、tone）")
+    if weight not in WEIGHTS:
+        raise ValueError(f"无效的计数方式：{weight}（可选：{'、'.join(WEIGHTS)}）")
+    if normalize not in (None, *NORMALIZE):
+        raise ValueError(f"无效的 normalize：{normalize}（可选：{'、'.join(NORMALIZE)}）")
+
+    flat = corr["tables"][(mc_attr, lang, part)][weight]
+    row_names = corr["mc_values"][mc_attr]
+    col_names = corr["modern_values"][lang][part]
+    ncols = len(col_names)
+    matrix = [flat[r * ncols:(r + 1) * ncols] for r in range(len(row_names))]
+
+    row_totals = [sum(row) for row in matrix]
+    col_totals = [sum(col) for col in zip(*matrix)]
+    keep_rows = [r for r, t in enumerate(row_totals) if t]
+    keep_cols = [c for c, t in enumerate(col_totals) if t]
+    total = sum(row_totals)
+
+    def scale(r, c):
+        v = matrix[r][c]
+        if normalize == "row":
+            return v / row_totals[r]
+        if normalize == "col":
+            return v / col_totals[c]
+        if normalize == "all":
+            return v / total
+        return v
+
+    return {
+        "mc": mc_attr, "lang": lang, "part": part, "weight": weight, "normalize": normalize,
+        "rows": [row_names[r] for r in keep_rows],
+        "cols": [col_names[c] for c in keep_cols],
+        "counts": [[round(scale(r, c), 4) for c in keep_cols] for r in keep_rows],
+        "row_totals": [round(row_totals[r], 4) for r in keep_rows],
+        "col_totals": [round(col_totals[c], 4) for c in keep_cols],
+        "total": round(total, 4),
+    }
+
+
+def format_table(table):
+    """列联表 → 制表符分隔的文本（命令行输出）"""
+    lines = ["\t".join([f"{table['mc']}＼{table['lang']}{PART_NAMES[table['part']]}",
+                        *table["cols"], "合计"])]
+    for name, row, total in zip(table["rows"], table["counts"], table["row_totals"]):
+        lines.append("\t".join([name, *(f"{v:g}" for v in row), f"{total:g}"]))
+    lines.append("\t".join(["合计", *(f"{v:g}" for v in table["col_totals"]), f"{table['total']:g}"]))
+    return "\n".join(lines)
+
+
+def main(argv):
+    args, opts = [], {}
+    it = iter(argv)
+    for arg in it:
+        if arg in ("--weight", "--normalize"):
+            opts[arg[2:]] = next(it, None)
+        else:
+            args.append(arg)
+    if len(args) != 3:
+        print("用法: python correspondence.py 中古属性 语言 成分 [--weight glyphs|freq|unambiguous]"
+              " [--normalize row|col|all]")
+        print(f"  中古属性：{'、'.join(ATTRS)}；语言：{'、'.join(LANGS)}；成分：initial、final、tone")
+        return
+    import snapshot
+    dataset = snapshot.load_dataset()
+    try:
+        table = contingency(dataset["correspondence"], *args, **opts)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print(format_table(table))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,83 @@
+# engine.py
+# 查询引擎选择：内存（默认，预编译快照）或 SQLite（sqlite_engine.py）。
+# 两者接口相同、结果一致，由环境变量 PJK_ENGINE=memory|sqlite 切换。
+import os
+
+from query import lookup, get_pronunciations, resolve_glyphs
+from homophone_map import lookup_homophones
+from reading_search import reading_glyphs, search_readings
+from category_search import category_breakdown, search_categories
+from correspondence import contingency
+from fanqie import char_fanqie, class_detail, speller_classes
+from near_search import near_homophones
+from snapshot import load_dataset
+
+
+class MemoryEngine:
+    name = "memory"
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.version = dataset["version"]
+        self.indexes = dataset["indexes"]
+        self.freq_table = dataset["freq_table"]
+
+    def resolve(self, char):
+        return resolve_glyphs(self.indexes, char)
+
+    def lookup(self, char):
+        return lookup(self.indexes, char)
+
+    def readings(self, char, col):
+        return get_pronunciations(self.indexes, char, col)
+
+    def compare_readings(self, from_lang, to_lang, readings, filter_common):
+        return lookup_homophones(
+            self.dataset["homophones"], self.indexes,
+            from_lang, to_lang, readings, filter_common
+        )
+
+    # ---------- 按读音 / 音韵地位查字、近音字、对应统计、反切系联 ----------
+    def search_readings(self, col, q, match="prefix", initial=None, final=None, tone=None,
+                        limit=None):
+        return search_readings(
+            self.dataset["reading_search"], self.indexes["readings"].names, col, q, match,
+            initial, final, tone, limit
+        )
+
+    def reading_glyphs(self, col, reading):
+        return reading_glyphs(self.indexes, col, reading)
+
+    def search_categories(self, conds):
+        return search_categories(self.dataset["categories"], self.indexes, conds)
+
+    def category_breakdown(self, glyphs, systems):
+        return category_breakdown(self.indexes, glyphs, systems)
+
+    def near_homophones(self, system, q, char, max_distance, tone_cost, limit=None):
+        return near_homophones(
+            self.dataset["near_search"], self.dataset["reading_search"], self.indexes,
+            self.freq_table, system, q, char, max_distance, tone_cost, limit
+        )
+
+    def contingency(self, mc_attr, lang, part, weight="glyphs", normalize=None):
+        return contingency(self.dataset["correspondence"], mc_attr, lang, part, weight, normalize)
+
+    def char_fanqie(self, char):
+        return char_fanqie(self.dataset["fanqie"], self.indexes, char)
+
+    def speller_classes(self, kind, speller):
+        return speller_classes(self.dataset["fanqie"], kind, speller)
+
+    def class_detail(self, kind, cid, limit=None):
+        return class_detail(self.dataset["fanqie"], self.indexes["rows"].glyphs, kind, cid, limit)
+
+
+def open_engine(name=None):
+    name = name or os.environ.get("PJK_ENGINE", "memory")
+    if name == "memory":
+        return MemoryEngine(load_dataset())
+    if name == "sqlite":
+        from sqlite_engine import SQLiteEngine
+        return SQLiteEngine()
+    raise ValueError(f"未知的查询引擎：{name}（可选 memory / sqlite）")
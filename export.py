@@ -0,0 +1,256 @@
+# export.py
+# 静态导出：把每个字的全部查询结果预先渲染成文件，供 nginx / CDN 直接返回。
+#
+# 目录结构（XXXX 为码位十六进制，如 東 → 6771；方向用 mandarin / cantonese / middle）：
+#   html/basic/XXXX.html                         基础查询页
+#   html/compare/<源>-<目标>/<all|common>/XXXX.html  音韵映射页（common = 只显示常用字）
+#   api/lookup/XXXX.json                         同 /api/lookup?chars=字
+#   api/compare/<源>-<目标>/<all|common>/XXXX.json   同 /api/compare?chars=字&directions=源→目标
+# 可选再生成 .gz / .br 预压缩副本（nginx gzip_static / brotli_static）。
+#
+# 内容相同的文件（如读音相同的字的音韵映射页）只存一份于 objects/，各路径硬链接过去。
+# 增量：manifest.json 记录每个文件的内容摘要；数据版本、模板与选项都没变时直接跳过，
+# 否则全部重新渲染，但只写出内容有变的文件，并删除已不存在的文件与不再引用的内容。
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from atomic import atomic_write
+from annotate import SYSTEMS
+from snapshot import file_digest
+
+OUT_DIR = "static_export"
+MANIFEST = "manifest.json"
+OBJECTS = "objects"
+COMPRESSED = ((".gz", "gzip"), (".br", "brotli"))
+TEMPLATE = os.path.join("templates", "index.html")
+CHUNK = 256
+
+LANGS = tuple(SYSTEMS)
+FILTERS = {False: "all", True: "common"}
+
+# 各进程里的 app 模块、旧清单与选项（子进程由 _init_worker 设定，不依赖 fork 继承）
+_app = None
+_old_files = {}
+_options = {}
+
+
+def glyph_name(glyph):
+    return f"{ord(glyph):04X}"
+
+
+def compare_dir(from_lang, to_lang, filter_common):
+    return f"{SYSTEMS[from_lang]}-{SYSTEMS[to_lang]}/{FILTERS[filter_common]}"
+
+
+# ================================
+# 渲染（子进程）
+# ================================
+def _init_worker(old_files=None, options=None):
+    """载入 app 模块（即加载数据、打开引擎）；子进程另从 initargs 取得旧清单与选项"""
+    global _app, _old_files, _options
+    import app
+    _app = app
+    if old_files is not None:
+        _old_files = old_files
+    if options is not None:
+        _options = options
+
+
+def render_glyph(glyph):
+    """一个字的全部页面与 JSON → [(相对路径, 内容字节)]"""
+    app = _app
+    name = glyph_name(glyph)
+    dumps = app.app.json.dumps
+    out = []
+
+    records = app.engine.lookup(glyph)
+    out.append((f"html/basic/{name}.html", app.render_page("basic", glyph, records)))
+    out.append((f"api/lookup/{name}.json", dumps({
+        "results": {glyph: [dict(r) for r in records]}, "missing": []
+    })))
+
+    for from_lang in LANGS:
+        for to_lang in LANGS:
+            for filter_common in FILTERS:
+                result = app.compare_pronunciations(
+                    app.engine, from_lang, to_lang, glyph, filter_common
+                )
+                sub = compare_dir(from_lang, to_lang, filter_common)
+                out.append((f"html/compare/{sub}/{name}.html", app.render_page(
+                    "compare", glyph, result, from_lang, to_lang, filter_common
+                )))
+                out.append((f"api/compare/{sub}/{name}.json", dumps({
+                    "results": {f"{from_lang}→{to_lang}": {glyph: result}}
+                })))
+    return [(path, text.encode("utf-8")) for path, text in out]
+
+
+def write_object(out_dir, digest, data):
+    """按内容摘要存一份（含压缩副本）；已存在则不重写"""
+    obj = os.path.join(out_dir, OBJECTS, digest[:2], digest)
+    if os.path.exists(obj) and all(
+        os.path.exists(obj + suffix) for suffix, enabled in COMPRESSED if _options.get(enabled)
+    ):
+        return obj
+    os.makedirs(os.path.dirname(obj), exist_ok=True)
+    if _options.get("gzip"):
+        with atomic_write(obj + ".gz", "wb") as f:
+            # mtime=0：内容不变则压缩结果也不变
+            with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=9, mtime=0) as gz:
+                gz.write(data)
+    if _options.get("brotli"):
+        import brotli
+        with atomic_write(obj + ".br", "wb") as f:
+            f.write(brotli.compress(data))
+    # 正文最后写：它存在即表示压缩副本也已齐全
+    with atomic_write(obj, "wb") as f:
+        f.write(data)
+    return obj
+
+
+def link(src, dst):
+    """dst 原子地指向 src（硬链接；不支持时复制）"""
+    try:
+        if os.path.samefile(src, dst):
+            return
+    except FileNotFoundError:
+        pass
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def write_file(out_dir, path, digest, data):
+    obj = write_object(out_dir, digest, data)
+    full = os.path.join(out_dir, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    link(obj, full)
+    for suffix, enabled in COMPRESSED:
+        if _options.get(enabled):
+            link(obj + suffix, full + suffix)
+        elif os.path.exists(full + suffix):
+            os.remove(full + suffix)
+
+
+def export_chunk(args):
+    """渲染一批字，只写出内容有变的文件 → ({相对路径 : 摘要}, 写出数)"""
+    out_dir, glyphs = args
+    digests = {}
+    written = 0
+    with _app.app.app_context():
+        for glyph in glyphs:
+            for path, data in render_glyph(glyph):
+                digest = hashlib.sha1(data).hexdigest()
+                digests[path] = digest
+                if _old_files.get(path) != digest or not os.path.exists(os.path.join(out_dir, path)):
+                    write_file(out_dir, path, digest, data)
+                    written += 1
+    return digests, written
+
+
+# ================================
+# 调度
+# ================================
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def export(out_dir=OUT_DIR, workers=None, use_gzip=False, use_brotli=False,
+           force=False, limit=None):
+    global _old_files, _options
+    if use_brotli:
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            raise SystemExit("❌ 生成 .br 需要安装 brotli（pip install brotli）")
+
+    _init_worker()
+    # 表内的字，加上只经异体别名表查得的字（如 东、发），与在线查询覆盖的字相同
+    indexes = _app.engine.dataset["indexes"]
+    glyphs = list(dict.fromkeys([*indexes["glyph_rows"], *indexes["aliases"]]))
+    if limit is not None:
+        glyphs = glyphs[:limit]
+
+    stamp = {
+        "data_version": _app.data_version,
+        "template": file_digest(TEMPLATE),
+        "exporter": file_digest(__file__),
+        "gzip": use_gzip,
+        "brotli": use_brotli,
+        "glyphs": len(glyphs),
+    }
+    old = load_manifest(out_dir)
+    if not force and old.get("stamp") == stamp:
+        print(f"⏭  数据版本 {stamp['data_version']} 未变，无需重新导出")
+        return
+
+    # 压缩选项变了则所有文件都要补写压缩副本
+    _old_files = old.get("files", {}) if old.get("stamp", {}).get("gzip") == use_gzip \
+        and old.get("stamp", {}).get("brotli") == use_brotli and not force else {}
+    _options = {"gzip": use_gzip, "brotli": use_brotli}
+
+    chunks = [(out_dir, glyphs[i:i + CHUNK]) for i in range(0, len(glyphs), CHUNK)]
+    files = {}
+    written = 0
+    workers = workers or os.cpu_count() or 1
+    if workers > 1:
+        # 子进程各自初始化，spawn / forkserver 启动方式下同样可用
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(_old_files, _options)) as pool:
+            results = pool.map(export_chunk, chunks)
+            for digests, n in results:
+                files.update(digests)
+                written += n
+    else:
+        for chunk in chunks:
+            digests, n = export_chunk(chunk)
+            files.update(digests)
+            written += n
+
+    removed = 0
+    for path in set(old.get("files", {})) - set(files):
+        for suffix in ("",) + tuple(suffix for suffix, _ in COMPRESSED):
+            try:
+                os.remove(os.path.join(out_dir, path + suffix))
+                removed += suffix == ""
+            except FileNotFoundError:
+                pass
+
+    live = set(files.values())
+    for root, _, names in os.walk(os.path.join(out_dir, OBJECTS)):
+        for name in names:
+            if name.split(".", 1)[0] not in live:
+                os.remove(os.path.join(root, name))
+
+    with atomic_write(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"stamp": stamp, "files": files}, f, ensure_ascii=False)
+    print(f"✅ 已导出 {len(files)} 个文件到 {out_dir}（写出 {written}，删除 {removed}）")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把全部查询结果导出为静态文件")
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--workers", type=int, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--gzip", action="store_true", help="同时生成 .gz")
+    parser.add_argument("--brotli", action="store_true", help="同时生成 .br（需 brotli）")
+    parser.add_argument("--force", action="store_true", help="忽略清单，全部重写")
+    parser.add_argument("--limit", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    export(args.out, args.workers, args.gzip, args.brotli, args.force, args.limit)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
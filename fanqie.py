@@ -0,0 +1,348 @@
+# fanqie.py
+# 反切系联：用并查集把反切上字归并成声类、下字归并成韵类。
+#   * 上字 A 自身的反切上字为 B，则 A、B 同类（同用、互用、递用一并处理）
+#   * 下字同理，但按《广韵》分卷（声调）分开系联：节点为 (下字, 声调)，
+#     只取下字在同一声调下的反切，以免多音字把不同调的韵类连成一片
+#   * 并查集带路径压缩与按大小合并，整表一遍近似线性，不必两两比较
+#   * 用字本身多音、各读音反切用字不同时，取与它所切音节的广韵标注相符的那个读音；
+#     恰好只有一个读音相符才系联，否则不向外系联
+# 结果（类、系联边、每个音节所属的类）随快照一起构建与缓存，源数据变了快照自动重建。
+# 用法：python fanqie.py 德            各读音的反切及上 / 下字所属的类
+#       python fanqie.py --class upper 德   德作为上字所在的声类（成员、系联边、被切字）
+#       python fanqie.py --stats        各类与广韵声母 / 韵母标注的吻合度与完整度
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+
+from query import resolve_glyphs
+
+KINDS = ("upper", "lower")
+
+
+class UnionFind:
+    """并查集（路径压缩 + 按大小合并）"""
+    __slots__ = ("parent", "size")
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def add(self, x):
+        if x not in self.parent:
+            self.parent[x] = x
+            self.size[x] = 1
+
+    def find(self, x):
+        parent = self.parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a, b):
+        self.add(a)
+        self.add(b)
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+
+def split_fanqie(fanqie):
+    """"德紅" → ("德", "紅")；去掉原表中表示存疑的问号，不是两字的返回 None"""
+    fanqie = fanqie.rstrip("?？")
+    return (fanqie[0], fanqie[1]) if len(fanqie) == 2 else None
+
+
+# ================================
+# 构建
+# ================================
+def iter_syllables(indexes):
+    """逐个音节产出 (行号, 上字, 下字, 广韵信息)，顺序与 category_search 的音节位置一致"""
+    store = indexes["rows"]
+    info_col, fanqie_col = store.columns["guangyun"], store.columns["fanqie"]
+    names = store.lines.names
+    for i in range(len(store)):
+        for info_id, fanqie_id in zip(info_col[i], fanqie_col[i]):
+            pair = split_fanqie(names[fanqie_id])
+            yield (i, *(pair or (None, None)), names[info_id])
+
+
+def upper_label(info):
+    return info[0]
+
+
+def lower_label(info):
+    """韵类的标注：呼 + 等 + 韵 + 声调，如 "開一東平" """
+    return info[1] + info[2] + info[4:] + info[3]
+
+
+def own_speller(readings, spelled, label_of):
+    """
+    用字自身的反切用字：readings 为用字各读音的 (反切用字, 广韵信息)，
+    spelled 为它所切音节的标注集合。只有一个反切用字时取之；多音时只看标注与 spelled 相符的读音，
+    相符的仍不止一个（或没有）时返回 None。
+    """
+    spellers = {s for s, _ in readings}
+    if len(spellers) > 1:
+        spellers = {s for s, info in readings if label_of(info) in spelled}
+    return spellers.pop() if len(spellers) == 1 else None
+
+
+def build_classes(uf, nodes, syllable_nodes, infos, label_of):
+    """并查集 → 类：按大小降序编号，标注取类内音节最常见的广韵标注"""
+    groups = defaultdict(list)
+    for node in nodes:
+        groups[uf.find(node)].append(node)
+    ordered = sorted(groups.values(), key=lambda g: (-len(g), min(g)))
+    class_of = {node: cid for cid, members in enumerate(ordered) for node in members}
+
+    labels = [Counter() for _ in ordered]
+    for node, info in zip(syllable_nodes, infos):
+        if node is not None:
+            labels[class_of[node]][label_of(info)] += 1
+    return {
+        "class_of": class_of,
+        "members": [sorted(g) for g in ordered],
+        "labels": [c.most_common(1)[0][0] if c else "" for c in labels],
+        "label_counts": [dict(c) for c in labels],
+    }
+
+
+def build_fanqie_index(indexes):
+    """
+    返回 {
+        "upper" / "lower": {
+            "class_of":     {节点 : 类号}（上字节点为字，下字节点为 (字, 声调)）,
+            "members":      [[节点]]（按类号）,
+            "labels":       [该类最常见的广韵声母 / 韵母标注],
+            "label_counts": [{标注 : 音节数}],
+            "edges":        [(节点, 其反切用字节点)]（系联图）,
+        },
+        "rows":  array，第 p 个音节所在的行号,
+        "upper_class" / "lower_class": array，第 p 个音节的上字 / 下字所属类号（无反切为 -1）,
+        "fanqie": [第 p 个音节的反切],
+    }
+    """
+    syllables = list(iter_syllables(indexes))
+
+    # 被切字 → 其各读音的 (上字, 下字, 广韵信息)
+    readings = defaultdict(list)
+    glyphs = indexes["rows"].glyphs
+    for i, upper, lower, info in syllables:
+        if upper:
+            readings[glyphs[i]].append((upper, lower, info))
+
+    upper_uf, lower_uf = UnionFind(), UnionFind()
+    upper_edges, lower_edges = set(), set()
+    upper_nodes, lower_nodes = [], []
+    # 用字节点 → 它所切音节的广韵标注
+    upper_spelled, lower_spelled = defaultdict(set), defaultdict(set)
+    for i, upper, lower, info in syllables:
+        if not upper:
+            upper_nodes.append(None)
+            lower_nodes.append(None)
+            continue
+        tone = info[3]
+        upper_uf.add(upper)
+        lower_uf.add((lower, tone))
+        upper_nodes.append(upper)
+        lower_nodes.append((lower, tone))
+        upper_spelled[upper].add(upper_label(info))
+        lower_spelled[(lower, tone)].add(lower_label(info))
+
+    # 用字多音、各读音的反切用字又不同时，取标注相符的唯一读音；无从判断的用字不向外系联
+    # （别的用字仍可系联到它），免得几个大类经由多音字连成一片
+    for upper in list(upper_uf.parent):
+        u = own_speller([(u, info) for u, _, info in readings.get(upper, ())],
+                        upper_spelled[upper], upper_label)
+        if u is not None:
+            upper_uf.union(upper, u)
+            if u != upper:
+                upper_edges.add((upper, u))
+    for lower, tone in list(lower_uf.parent):
+        l = own_speller([(l, info) for _, l, info in readings.get(lower, ()) if info[3] == tone],
+                        lower_spelled[(lower, tone)], lower_label)
+        if l is not None:
+            lower_uf.union((lower, tone), (l, tone))
+            if l != lower:
+                lower_edges.add(((lower, tone), (l, tone)))
+
+    infos = [info for _, _, _, info in syllables]
+    upper = build_classes(upper_uf, upper_uf.parent, upper_nodes, infos, upper_label)
+    lower = build_classes(lower_uf, lower_uf.parent, lower_nodes, infos, lower_label)
+    upper["edges"] = sorted(upper_edges)
+    lower["edges"] = sorted(lower_edges)
+
+    return {
+        "upper": upper,
+        "lower": lower,
+        "rows": array("I", (i for i, _, _, _ in syllables)),
+        "upper_class": array("i", (upper["class_of"][n] if n else -1 for n in upper_nodes)),
+        "lower_class": array("i", (lower["class_of"][n] if n else -1 for n in lower_nodes)),
+        "fanqie": [f"{u}{l}" if u else "" for _, u, l, _ in syllables],
+    }
+
+
+# ================================
+# 查询
+# ================================
+def node_name(node):
+    """节点 → 显示用字符串：上字为字本身，下字为 "紅（平）" """
+    return node if isinstance(node, str) else f"{node[0]}（{node[1]}）"
+
+
+def class_summary(fq, kind, cid):
+    side = fq[kind]
+    return {
+        "kind": kind,
+        "class": cid,
+        "label": side["labels"][cid],
+        "size": len(side["members"][cid]),
+    }
+
+
+def fanqie_items(fq, rows):
+    """
+    rows 为 [(行号, 字, [广韵信息…])]（按行号升序）→ 各读音的反切及上 / 下字所属的类：
+      [{"glyph", "info", "fanqie", "upper": {类信息 + "speller"}, "lower": {...}}]
+    """
+    positions = fq["rows"]
+    out = []
+    for i, glyph, infos in rows:
+        # 音节按行号排列，二分即得本行的音节位置
+        start = bisect_left(positions, i)
+        for info, p in zip(infos, range(start, bisect_right(positions, i, start))):
+            fanqie = fq["fanqie"][p]
+            item = {"glyph": glyph, "info": info, "fanqie": fanqie}
+            for kind, speller in zip(KINDS, fanqie or ("", "")):
+                cid = fq[f"{kind}_class"][p]
+                item[kind] = {"speller": speller, **class_summary(fq, kind, cid)}
+            if not fanqie:
+                item["upper"] = item["lower"] = None
+            out.append(item)
+    return out
+
+
+def char_fanqie(fq, indexes, char):
+    """字各读音的反切及上 / 下字所属的类（表外异体字按对应字），见 fanqie_items"""
+    glyph_rows = indexes["glyph_rows"]
+    store = indexes["rows"]
+    rows = sorted(i for g in resolve_glyphs(indexes, char) for i in glyph_rows[g])
+    return fanqie_items(fq, [(i, store.glyphs[i], store[i].lines("广韵信息")) for i in rows])
+
+
+def speller_classes(fq, kind, char):
+    """char 作为上字 / 下字时所在的类号（下字按声调可能分属多类）"""
+    class_of = fq[kind]["class_of"]
+    if kind == "upper":
+        return [class_of[char]] if char in class_of else []
+    return sorted({cid for node, cid in class_of.items() if node[0] == char})
+
+
+def class_rows(fq, kind, cid):
+    """类内全部被切字所在的行号（按原表行序，不重复）"""
+    classes = fq[f"{kind}_class"]
+    return list(dict.fromkeys(i for p, i in enumerate(fq["rows"]) if classes[p] == cid))
+
+
+def class_detail(fq, glyphs, kind, cid, limit=None):
+    """
+    类的成员、系联边与全部被切字（按原表行序，limit 个即止）。
+    glyphs 为 行号 → 字 的映射（indexes["rows"].glyphs，或只含所需行的 dict）。
+    """
+    if kind not in KINDS or not 0 <= cid < len(fq[kind]["members"]):
+        raise ValueError(f"无效的类：{kind} {cid}")
+    side = fq[kind]
+    members = set(side["members"][cid])
+    rows = class_rows(fq, kind, cid)
+    return {
+        **class_summary(fq, kind, cid),
+        "members": [node_name(n) for n in side["members"][cid]],
+        "label_counts": side["label_counts"][cid],
+        "edges": [[node_name(a), node_name(b)] for a, b in side["edges"] if a in members],
+        "glyph_count": len(rows),
+        "glyphs": [glyphs[i] for i in (rows[:limit] if limit is not None else rows)],
+    }
+
+
+def class_stats(fq):
+    """
+    各类数目与吻合度、完整度：
+      purity        类内与该类标注一致的音节比例
+      completeness  各广韵标注的音节落在该标注最大一类里的比例
+      per_label     每种广韵标注平均分散在几类里
+      singletons    只有一个用字的类数
+    """
+    stats = {}
+    for kind in KINDS:
+        counts = fq[kind]["label_counts"]
+        total = sum(sum(c.values()) for c in counts)
+        agree = sum(max(c.values()) for c in counts if c)
+        by_label = defaultdict(list)
+        for c in counts:
+            for label, n in c.items():
+                by_label[label].append(n)
+        whole = sum(max(ns) for ns in by_label.values())
+        stats[kind] = {
+            "classes": len(counts),
+            "labels": len(by_label),
+            "singletons": sum(len(m) == 1 for m in fq[kind]["members"]),
+            "purity": round(agree / total, 4) if total else 0.0,
+            "completeness": round(whole / total, 4) if total else 0.0,
+            "per_label": round(sum(map(len, by_label.values())) / len(by_label), 2) if by_label else 0.0,
+        }
+    return stats
+
+
+def main(argv):
+    import snapshot
+    if not argv:
+        print("用法: python fanqie.py 汉字 | --class upper|lower 汉字 | --stats")
+        return
+    dataset = snapshot.load_dataset()
+    fq, indexes = dataset["fanqie"], dataset["indexes"]
+
+    if argv[0] == "--stats":
+        names = {"upper": "声类", "lower": "韵类"}
+        for kind, s in class_stats(fq).items():
+            print(f"{names[kind]}：{s['classes']} 类（单字类 {s['singletons']}，"
+                  f"广韵标注 {s['labels']} 种，每种平均分在 {s['per_label']:g} 类），"
+                  f"吻合度 {s['purity']:.1%}，完整度 {s['completeness']:.1%}")
+        return
+
+    if argv[0] == "--class" and len(argv) == 3:
+        kind, char = argv[1], argv[2]
+        if kind not in KINDS:
+            print("❌ 类别只能是 upper 或 lower")
+            return
+        cids = speller_classes(fq, kind, char)
+        if not cids:
+            print(f"「{char}」未作过反切{'上' if kind == 'upper' else '下'}字。")
+        for cid in cids:
+            d = class_detail(fq, indexes["rows"].glyphs, kind, cid)
+            print(f"类 {cid}（{d['label']}，{d['size']} 个用字）：{'、'.join(d['members'])}")
+            print(f"  系联：{'；'.join(f'{a}→{b}' for a, b in d['edges'])}")
+            print(f"  被切字 {d['glyph_count']} 个：{''.join(d['glyphs'][:200])}")
+        return
+
+    char = argv[0]
+    items = char_fanqie(fq, indexes, char)
+    if not items:
+        print(f"没找到「{char}」的反切。")
+    for item in items:
+        print(f"{item['glyph']} {item['info']} {item['fanqie']}切")
+        for kind, name in zip(KINDS, ("上字", "下字")):
+            c = item[kind]
+            if c:
+                print(f"  {name} {c['speller']}：类 {c['class']}（{c['label']}，{c['size']} 个用字）")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
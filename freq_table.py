@@ -0,0 +1,119 @@
+# freq_table.py
+# 合并字频表：一个文件存全部字形的 普通话 / 粤语 / 综合 字频及名次。
+# 按列存放（字形拼成一个字符串，其余各列为等长整数数组），紧凑 JSON，加载只需一次解析。
+import heapq
+import json
+
+from atomic import atomic_write
+
+FREQ_TABLE_PATH = "freq_table.json"
+FREQ_TABLE_FORMAT = 1
+
+FREQ_COLUMNS = ("mandarin", "cantonese", "overall")
+
+
+def rank(values):
+    """字频 → 名次（降序，同频同名次，如 1, 2, 2, 4）；字频为 0 的记 0（不参与排名）"""
+    order = sorted(range(len(values)), key=lambda i: -values[i])
+    ranks = [0] * len(values)
+    for pos, i in enumerate(order):
+        if values[i] <= 0:
+            break
+        if pos and values[i] == values[order[pos - 1]]:
+            ranks[i] = ranks[order[pos - 1]]
+        else:
+            ranks[i] = pos + 1
+    return ranks
+
+
+def build_freq_table(glyphs, mandarin, cantonese):
+    """
+    glyphs: 按码位排序的字形列表；mandarin / cantonese: 与之对齐的字频。
+    返回 {"glyphs": str, "mandarin": [...], "cantonese": [...], "overall": [...],
+          "mandarin_rank": [...], "cantonese_rank": [...], "overall_rank": [...]}
+    """
+    table = {
+        "format": FREQ_TABLE_FORMAT,
+        "glyphs": "".join(glyphs),
+        "mandarin": list(mandarin),
+        "cantonese": list(cantonese),
+        "overall": [max(m, c) for m, c in zip(mandarin, cantonese)],
+    }
+    for col in FREQ_COLUMNS:
+        table[f"{col}_rank"] = rank(table[col])
+    return table
+
+
+def write_freq_table(table, path=FREQ_TABLE_PATH):
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_freq_table(path=FREQ_TABLE_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    if table.get("format") != FREQ_TABLE_FORMAT:
+        raise ValueError(f"{path} 格式版本不符（需要 {FREQ_TABLE_FORMAT}），请重新运行 get_freq.py")
+    return table
+
+
+def freq_dict(table, col):
+    """某列字频 → {字 : 字频}（含字频为 0 的字）"""
+    return dict(zip(table["glyphs"], table[col]))
+
+
+# ================================
+# 按字频排名筛选（名次在构建时已算好，这里只做查表 + 堆选 top-k）
+# ================================
+# 源语言 → 默认排名所用字频
+RANK_BY_LANG = {"普通话": "mandarin", "粤语": "cantonese", "广韵": "overall"}
+
+UNRANKED = float("inf")
+
+
+def rank_keys(table, col):
+    """{字 : 名次}（无字频的为 inf），每列首次用到时生成"""
+    cache = table.setdefault("rank_keys", {})
+    if col not in cache:
+        cache[col] = {
+            g: r or UNRANKED for g, r in zip(table["glyphs"], table[f"{col}_rank"])
+        }
+    return cache[col]
+
+
+def ranked_count(table, col):
+    """有频字（有名次的字）的个数，每列首次用到时数一遍"""
+    cache = table.setdefault("ranked_counts", {})
+    if col not in cache:
+        cache[col] = sum(1 for r in table[f"{col}_rank"] if r)
+    return cache[col]
+
+
+def percentile_rank(table, col, percentile):
+    """前 percentile% 的有频字所对应的最大名次"""
+    return max(1, int(ranked_count(table, col) * percentile / 100))
+
+
+def select_glyphs(table, glyphs, col, min_freq=0, max_rank=None, limit=None):
+    """
+    按字频名次从高到低排列 glyphs（同名次按码位），
+    可按最低字频 / 最大名次筛选；给了 limit 则用堆只取前 limit 个。
+    """
+    ranks = rank_keys(table, col)
+    if min_freq > 0 or max_rank is not None:
+        freqs = table.setdefault("freq_keys", {})
+        if col not in freqs:
+            freqs[col] = freq_dict(table, col)
+        freqs = freqs[col]
+        glyphs = [
+            g for g in glyphs
+            if freqs.get(g, 0) >= min_freq
+            and (max_rank is None or ranks.get(g, UNRANKED) <= max_rank)
+        ]
+
+    def key(g):
+        return ranks.get(g, UNRANKED), g
+
+    if limit is not None and limit < len(glyphs):
+        return heapq.nsmallest(limit, glyphs, key=key)
+    return sorted(glyphs, key=key)
@@ -1,120 +1,141 @@
 import pandas as pd
 import json
+import opencc
 from opencc import OpenCC
 
+from atomic import atomic_write
+from freq_table import FREQ_TABLE_PATH, build_freq_table, write_freq_table
+
+MANDARIN_XLS = "CharFreq-Modern.xls"
+CANTONESE_CSV = "charcount.csv"
+GUANGYUN_CSV = "guangyun_with_all_readings.csv"
+# OpenCC 转换结果缓存：字集不变时重跑无需再调 OpenCC（OpenCC 版本变了则作废）
+OPENCC_CACHE = "opencc_cache.json"
+
+
+def single_glyph_freq(chars, freqs):
+    """两列 → {字 : 字频}，只保留单字（列运算，不逐行遍历）"""
+    mask = chars.str.len().eq(1)  # 非字符串为 NaN，自动剔除
+    return dict(zip(chars[mask].tolist(), freqs[mask].astype(int).tolist()))
+
+
 # ------------------------------
 # 1. 读取普通话字频表
 # ------------------------------
 
-print("正在读取普通话字频表…")
-
-df = pd.read_excel(
-    "CharFreq-Modern.xls",
-    sheet_name="CharFreq",
-    skiprows=5,
-    engine="xlrd"  
-)
+def load_mandarin_freq(path=MANDARIN_XLS):
+    print("正在读取普通话字频表…")
 
-print("列名为：", df.columns.tolist())
+    df = pd.read_excel(
+        path,
+        sheet_name="CharFreq",
+        skiprows=5,
+        engine="xlrd"
+    )
 
-# 假设列名确为 "汉字" 与 "频率"
-mandarin_freq = {
-    row["汉字"]: int(row["频率"])
-    for _, row in df.iterrows()
-    if isinstance(row["汉字"], str) and len(row["汉字"]) == 1
-}
+    print("列名为：", df.columns.tolist())
 
-with open("mandarin_freq_raw.json", "w", encoding="utf-8") as f:
-    json.dump(mandarin_freq, f, ensure_ascii=False, indent=2)
+    # 假设列名确为 "汉字" 与 "频率"
+    return single_glyph_freq(df["汉字"], df["频率"])
 
-print("✔ 普通话字频导出成功：mandarin_freq_raw.json（简体）")
 
 # ------------------------------
 # 2. 读取粤语字频表
 # ------------------------------
 
-print("正在读取粤语字频表…")
+def load_cantonese_freq(path=CANTONESE_CSV):
+    print("正在读取粤语字频表…")
 
-df2 = pd.read_csv(
-    "charcount.csv",
-    skiprows=93,
-    header=None,
-    names=["字", "頻率"],
-    encoding="utf-8"
-)
+    df2 = pd.read_csv(
+        path,
+        skiprows=93,
+        header=None,
+        names=["字", "頻率"],
+        encoding="utf-8"
+    )
 
-print("列名为：", df2.columns.tolist())
-cantonese_freq = {
-    row["字"]: int(row["頻率"])
-    for _, row in df2.iterrows()
-    if isinstance(row["字"], str) and len(row["字"]) == 1
-}
+    print("列名为：", df2.columns.tolist())
+    return single_glyph_freq(df2["字"], df2["頻率"])
 
-with open("cantonese_freq_raw.json", "w", encoding="utf-8") as f:
-    json.dump(cantonese_freq, f, ensure_ascii=False, indent=2)
-
-print("✔ 粤语字频导出成功：cantonese_freq_raw.json（繁体）")
 
 # ------------------------------
 # 3. 读取广韵字表 提取所有字形
 # ------------------------------
 
-print("正在读取广韵字表…")
+def load_glyph_list(path=GUANGYUN_CSV):
+    print("正在读取广韵字表…")
+
+    df3 = pd.read_csv(path, encoding="utf-8-sig", usecols=["glyph"])
+    glyph_list = sorted(df3["glyph"].unique().tolist())
 
-df3 = pd.read_csv("guangyun_with_all_readings.csv", encoding="utf-8-sig")
-glyph_list = sorted(set(df3["glyph"].tolist()))
+    print(f"✔ 从广韵数据库读取到 {len(glyph_list)} 个字形。")
+    return glyph_list
 
-print(f"✔ 从广韵数据库读取到 {len(glyph_list)} 个字形。")
 
 # ------------------------------
-# 4. 构建 mandarin_freq_all
+# 4. 繁简转换（整表一次调用 + 持久缓存）
 # ------------------------------
 
-def build_mandarin_freq_all(mandarin_freq_raw, glyph_list):
-    t2s = OpenCC('t2s')  # 繁 → 简
-    freq_all = {}
-    for g in glyph_list:
-        simp = t2s.convert(g)
-        freq_all[g] = mandarin_freq_raw.get(simp, 0)
-    return freq_all
-
-mandarin_freq_all = build_mandarin_freq_all(mandarin_freq, glyph_list)
+def load_opencc_cache(path=OPENCC_CACHE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if cache.get("opencc") != getattr(opencc, "__version__", ""):
+        return {}
+    return cache
+
+
+def save_opencc_cache(cache, path=OPENCC_CACHE):
+    cache["opencc"] = getattr(opencc, "__version__", "")
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def convert_glyphs(glyph_list, config, cache):
+    """
+    逐字转换（每个字单独成行，OpenCC 的词组匹配不会跨行），
+    缓存里没有的字拼成一个字符串，一次 convert 完成。
+    """
+    table = cache.setdefault(config, {})
+    missing = [g for g in glyph_list if g not in table]
+    if missing:
+        converted = OpenCC(config).convert("\n".join(missing)).split("\n")
+        if len(converted) != len(missing):
+            raise ValueError(f"OpenCC {config} 转换前后行数不一致")
+        table.update(zip(missing, converted))
+    return [table[g] for g in glyph_list]
 
-with open("mandarin_freq_all.json", "w", encoding="utf-8") as f:
-    json.dump(mandarin_freq_all, f, ensure_ascii=False, indent=2)
-
-print("✔ 普通话字频（全字集）已导出：mandarin_freq_all.json")
 
 # ------------------------------
-# 5. 构建 cantonese_freq_all
+# 5. 对齐到广韵全字集
 # ------------------------------
 
-def build_cantonese_freq_all(cantonese_freq_raw, glyph_list):
-    s2t = OpenCC('s2t')  # 简 → 繁
-    freq_all = {}
-    for g in glyph_list:
-        trad = s2t.convert(g)
-        freq_all[g] = cantonese_freq_raw.get(trad, 0)
-    return freq_all
+def align_freq(freq_raw, converted):
+    return [freq_raw.get(c, 0) for c in converted]
 
-cantonese_freq_all = build_cantonese_freq_all(cantonese_freq, glyph_list)
 
-with open("cantonese_freq_all.json", "w", encoding="utf-8") as f:
-    json.dump(cantonese_freq_all, f, ensure_ascii=False, indent=2)
+def main():
+    mandarin_freq = load_mandarin_freq()   # 简体
+    cantonese_freq = load_cantonese_freq() # 繁体
+    glyph_list = load_glyph_list()
 
-print("✔ 粤语字频（全字集）已导出：cantonese_freq_all.json")
+    cache = load_opencc_cache()
+    simplified = convert_glyphs(glyph_list, "t2s", cache)   # 繁 → 简，查普通话字频
+    traditional = convert_glyphs(glyph_list, "s2t", cache)  # 简 → 繁，查粤语字频
+    save_opencc_cache(cache)
 
-# ------------------------------
-# 6. 综合频率 overall_freq
-# ------------------------------
+    table = build_freq_table(
+        glyph_list,
+        align_freq(mandarin_freq, simplified),
+        align_freq(cantonese_freq, traditional),
+    )
+    write_freq_table(table)
 
-overall = {
-    g: max(mandarin_freq_all.get(g, 0), cantonese_freq_all.get(g, 0))
-    for g in glyph_list
-}
+    print(f"✔ 字频表已导出：{FREQ_TABLE_PATH}（{len(glyph_list)} 字；普通话 / 粤语 / 综合 字频及名次）")
+    print("🎉 全部频率表已成功生成！")
 
-with open("overall_freq.json", "w", encoding="utf-8") as f:
-    json.dump(overall, f, ensure_ascii=False, indent=2)
 
-print("✔ 综合字频已导出：overall_freq.json")
-print("🎉 全部频率表已成功生成！")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# homophone_map.py
+# 预先物化 3×3 个方向上“每个读音 → 同音字及其目标语言分组”的结果。
+# 查询时单读音字只需一次字典查找；多读音字合并各读音的结果。
+# 直接运行本脚本可导出 JSON，供客户端离线使用。
+import json
+from collections import defaultdict
+
+from atomic import atomic_write
+from query import LANG_MAP, common_filter, compare_readings, fold_groups
+
+OUT = "homophone_map.json"
+
+DIRECTIONS = [(f, t) for f in LANG_MAP for t in LANG_MAP]
+
+
+# ================================
+# 构建
+# ================================
+def build_homophone_map(indexes, mandarin_freq, cantonese_freq):
+    """
+    返回 hmap[(源语言, 目标语言, 只显示常用字)][读音] = {
+        "same_sound": "字字…",
+        "groups": {目标读音: "字字…"}  或  "groups_folded": {"中古全拼（广韵信息）": "字…"}
+    }
+    （字形含多码位时，"字字…" 存为列表）
+    """
+    names = indexes["readings"].names
+    # 字形都是单个码位时，字列表直接存成字符串，体积与反序列化开销都小得多
+    pack = "".join if isinstance(indexes["rows"].glyphs, str) else list
+    hmap = {}
+    for from_lang, to_lang in DIRECTIONS:
+        index = indexes["by_reading"][LANG_MAP[from_lang]]
+        readings = [names[rid] for rid in range(len(names)) if index[rid]]
+        common = common_filter(from_lang, mandarin_freq, cantonese_freq)
+
+        for filter_common in (False, True):
+            if filter_common and common is None:
+                # 广韵为源时过滤无效果，与不过滤共用同一张表
+                hmap[(from_lang, to_lang, True)] = hmap[(from_lang, to_lang, False)]
+                continue
+            entries = {}
+            for p in readings:
+                res = compare_readings(
+                    indexes, from_lang, to_lang, [p],
+                    common if filter_common else None
+                )
+                del res["mode"], res["readings"]
+                res["same_sound"] = pack(res["same_sound"])
+                if "groups" in res:
+                    res["groups"] = {k: pack(v) for k, v in res["groups"].items()}
+                entries[p] = res
+            hmap[(from_lang, to_lang, filter_common)] = entries
+    return hmap
+
+
+# ================================
+# 查询
+# ================================
+def lookup_homophones(hmap, indexes, from_lang, to_lang, readings, filter_common):
+    """与 query.compare_readings 结果一致，但只做查表与合并"""
+    entries = hmap[(from_lang, to_lang, bool(filter_common))]
+    hits = [entries[p] for p in readings if p in entries]
+
+    if len(hits) == 1:
+        same_sound = list(hits[0]["same_sound"])
+    else:
+        same_sound = sorted({g for e in hits for g in e["same_sound"]})
+
+    if to_lang == "广韵":
+        if len(hits) == 1:
+            folded = hits[0]["groups_folded"]
+        else:
+            # 折叠分组的顺序取决于原表行序，多读音时按合并后的字集重算
+            folded = fold_groups(indexes, same_sound)
+        return {
+            "mode": "to_guangyun_fold",
+            "readings": readings,
+            "same_sound": same_sound,
+            "groups_folded": folded
+        }
+
+    if len(hits) == 1:
+        groups = {k: list(v) for k, v in hits[0]["groups"].items()}
+    else:
+        merged = defaultdict(set)
+        for e in hits:
+            for k, v in e["groups"].items():
+                merged[k].update(v)
+        groups = {k: sorted(v) for k, v in sorted(merged.items())}
+    return {
+        "mode": "normal",
+        "readings": readings,
+        "same_sound": same_sound,
+        "groups": groups
+    }
+
+
+# ================================
+# 导出 JSON
+# ================================
+def export_json(hmap, version, path=OUT):
+    directions = {}
+    for (from_lang, to_lang, filter_common), entries in hmap.items():
+        d = directions.setdefault(f"{from_lang}→{to_lang}", {})
+        d["common" if filter_common else "all"] = entries
+
+    with atomic_write(path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "directions": directions},
+                  f, ensure_ascii=False, separators=(",", ":"))
+
+
+if __name__ == "__main__":
+    from snapshot import load_dataset
+
+    dataset = load_dataset()
+    export_json(dataset["homophones"], dataset["version"])
+    print(f"✅ 已导出 {OUT}（数据版本 {dataset['version']}）")
@@ -0,0 +1,40 @@
+# memory_report.py
+# 对比两种内存表示的占用：
+#   旧：csv.DictReader 得到的 [dict]，再按需 split 读音
+#   新：model.Record + 驻留读音 ID（query.build_indexes）
+import gc
+import tracemalloc
+
+from query import CSV_PATH, load_data, build_indexes
+
+
+def measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    obj = fn()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, peak
+
+
+def fmt(n):
+    return f"{n / 1024 / 1024:7.2f} MB"
+
+
+def main(path=CSV_PATH):
+    rows, dict_cur, dict_peak = measure(lambda: load_data(path))
+    # CSV 字典行在解析后即被释放，只留下 Record 与驻留表
+    records, rec_cur, rec_peak = measure(lambda: build_indexes(load_data(path))["rows"])
+    indexes, full_cur, full_peak = measure(lambda: build_indexes(load_data(path)))
+
+    print(f"记录数：{len(rows)}")
+    print(f"{'表示':<24}{'常驻':>12}{'峰值':>12}")
+    print(f"{'[dict]（旧）':<22}{fmt(dict_cur):>12}{fmt(dict_peak):>12}")
+    print(f"{'[Record]（新）':<21}{fmt(rec_cur):>12}{fmt(rec_peak):>12}")
+    print(f"{'[Record] + 全部索引':<20}{fmt(full_cur):>12}{fmt(full_peak):>12}")
+    print(f"记录部分节省：{1 - rec_cur / dict_cur:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# metrics.py
+# 进程内指标：计数器、仪表、直方图，按 Prometheus 文本格式输出。
+# 每次记录只是一次加锁的加法 / 二分分桶，开销很小，可在满负载下常开。
+# gunicorn 多 worker 时每个进程各自计数（抓取到的是处理该请求的 worker）。
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 秒
+TIME_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# 结果字数
+SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=None):
+    pairs = list(labels)
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}          # 名称 → (类型, 说明, 分桶)
+        self._values = {}        # (名称, 标签) → 数值 / 直方图 [各桶计数…, 总和, 次数]
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """kind: counter | gauge | histogram；histogram 需给出分桶上界"""
+        self._meta[name] = (kind, help_text, tuple(buckets or ()))
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[(name, tuple(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self._meta[name][2]
+        key = (name, tuple(labels.items()))
+        i = bisect.bisect_left(buckets, value)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None:
+                h = self._values[key] = [0] * (len(buckets) + 3)
+            h[i] += 1            # 最后一个桶即 +Inf
+            h[-2] += value
+            h[-1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            values = {k: (list(v) if isinstance(v, list) else v)
+                      for k, v in self._values.items()}
+
+        by_name = {}
+        for (name, labels), v in values.items():
+            by_name.setdefault(name, []).append((labels, v))
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, v in sorted(by_name.get(name, ()), key=lambda x: x[0]):
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {v}")
+                    continue
+                cumulative = 0
+                for le, count in zip(buckets + ("+Inf",), v):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {v[-2]}")
+                lines.append(f"{name}_count{_labels(labels)} {v[-1]}")
+        return "\n".join(lines) + "\n"
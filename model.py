@@ -0,0 +1,205 @@
+# model.py
+# 紧凑的内存数据模型（列式存储）：
+#   * 所有字形拼成一个字符串，按行号取字
+#   * 读音只解析一次，驻留成整数 ID，按列存入 array（offsets + values）
+#   * 广韵信息 / 反切 / 中古全拼 按行对齐，同样按列存 ID
+#   * Record 只是 (store, 行号) 的轻量视图，查询时按需生成
+from array import array
+
+
+class ReadingTable:
+    """读音驻留表：字符串 ⇄ 整数 ID"""
+    __slots__ = ("names", "ids")
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def intern(self, name):
+        rid = self.ids.get(name)
+        if rid is None:
+            rid = len(self.names)
+            self.names.append(name)
+            self.ids[name] = rid
+        return rid
+
+    def get(self, name):
+        return self.ids.get(name)
+
+    def name(self, rid):
+        return self.names[rid]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getstate__(self):
+        return self.names
+
+    def __setstate__(self, names):
+        self.names = names
+        self.ids = {n: i for i, n in enumerate(names)}
+
+
+COLUMNS = ("glyph", "unicode", "广韵信息", "反切", "polyhedron中古全拼",
+           "mandarin_pinyin", "cantonese_jyutping")
+
+# 原 CSV 列 → (store 内部列名, 单元格内分隔符, 驻留表)
+FIELDS = {
+    "广韵信息": ("guangyun", "\n", "lines"),
+    "反切": ("fanqie", "\n", "lines"),
+    "polyhedron中古全拼": ("middle", "\n", "readings"),
+    "mandarin_pinyin": ("mandarin", "；", "readings"),
+    "cantonese_jyutping": ("cantonese", "；", "readings"),
+}
+
+# 中古音各列（表内简体字从其繁体来源并入的只有这几列）
+MIDDLE_COLUMNS = ("广韵信息", "反切", "polyhedron中古全拼")
+
+# 读音列 → Record 属性
+READING_ATTRS = {col: FIELDS[col][0] for col in
+                 ("mandarin_pinyin", "cantonese_jyutping", "polyhedron中古全拼")}
+
+
+def split_readings(val):
+    """把 "dōng；tóng" / "tung\\nduwng" 这类单元格拆成读音列表"""
+    return [p.strip() for p in val.replace("\n", "；").split("；") if p.strip()]
+
+
+class Column:
+    """变长整数列：第 i 行的值为 values[offsets[i]:offsets[i+1]]"""
+    __slots__ = ("offsets", "values")
+
+    def __init__(self):
+        self.offsets = array("I", [0])
+        self.values = array("I")
+
+    def append(self, ids):
+        self.values.extend(ids)
+        self.offsets.append(len(self.values))
+
+    def __getitem__(self, i):
+        return tuple(self.values[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getstate__(self):
+        return self.offsets.tobytes(), self.values.tobytes()
+
+    def __setstate__(self, state):
+        self.offsets = array("I")
+        self.offsets.frombytes(state[0])
+        self.values = array("I")
+        self.values.frombytes(state[1])
+
+
+class RecordStore:
+    """整张表：按列存储，store[i] 得到第 i 行的 Record 视图"""
+    __slots__ = ("glyphs", "readings", "lines", "columns")
+
+    def __init__(self, rows):
+        self.readings = ReadingTable()
+        self.lines = ReadingTable()
+        self.columns = {attr: Column() for attr, _, _ in FIELDS.values()}
+
+        glyphs = []
+        for row in rows:
+            glyphs.append(row["glyph"])
+            for col, (attr, _, table) in FIELDS.items():
+                table = getattr(self, table)
+                self.columns[attr].append(
+                    table.intern(p) for p in split_readings(row.get(col) or "")
+                )
+        # 字形均为单个码位时拼成一个字符串，省去逐个 str 对象
+        if all(len(g) == 1 for g in glyphs):
+            self.glyphs = "".join(glyphs)
+        else:
+            self.glyphs = glyphs
+
+    def __len__(self):
+        return len(self.glyphs)
+
+    def __getitem__(self, i):
+        return Record(self, i)
+
+    def __iter__(self):
+        return (Record(self, i) for i in range(len(self.glyphs)))
+
+    def __getstate__(self):
+        return self.glyphs, self.readings, self.lines, self.columns
+
+    def __setstate__(self, state):
+        self.glyphs, self.readings, self.lines, self.columns = state
+
+
+class Record:
+    """
+    一个字形的全部信息（store 中一行的视图）。
+    仍支持 r["广韵信息"] / r.get("mandarin_pinyin") 这样按原 CSV 列名取值，
+    返回与原表单元格一致的字符串，模板与命令行脚本无需改动。
+    """
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def glyph(self):
+        return self.store.glyphs[self.row]
+
+    @property
+    def unicode(self):
+        return f"U+{ord(self.glyph):04X}"
+
+    def reading_ids(self, col):
+        return self.store.columns[READING_ATTRS[col]][self.row]
+
+    def reading_names(self, col):
+        names = self.store.readings.names
+        return [names[i] for i in self.reading_ids(col)]
+
+    def lines(self, col):
+        """广韵信息 / 反切 等按行存储的列"""
+        attr, _, table = FIELDS[col]
+        names = getattr(self.store, table).names
+        return [names[i] for i in self.store.columns[attr][self.row]]
+
+    def fold_pairs(self):
+        """[(中古全拼, 广韵信息)]，按单元格内行对齐"""
+        return list(zip(self.lines("polyhedron中古全拼"), self.lines("广韵信息")))
+
+    def __getitem__(self, key):
+        if key == "glyph":
+            return self.glyph
+        if key == "unicode":
+            return self.unicode
+        if key in FIELDS:
+            return FIELDS[key][1].join(self.lines(key))
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return COLUMNS
+
+    def to_dict(self):
+        return {k: self[k] for k in COLUMNS}
+
+    def __repr__(self):
+        return f"Record({self.glyph!r}, {self.unicode!r})"
+
+
+class MiddleRecord(Record):
+    """并入表内简体字的繁体来源行：只取中古音各列，现代读音为空（仍记在简体字本身）"""
+    __slots__ = ()
+
+    def reading_ids(self, col):
+        return super().reading_ids(col) if col in MIDDLE_COLUMNS else ()
+
+    def lines(self, col):
+        return super().lines(col) if col in MIDDLE_COLUMNS else []
+
+    def __repr__(self):
+        return f"MiddleRecord({self.glyph!r}, {self.unicode!r})"
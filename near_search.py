@@ -0,0 +1,201 @@
+# near_search.py
+# 近音字查询：读音不必完全相同，按编辑距离找相近的读音及其字。
+#   * 每个读音系统以不计声调的读音主体（reading_search 的 toneless 键）建一棵 BK 树，
+#     距离为音位级编辑距离：读音先按 PHONEMES 切成音位（粤拼的 ng、gw、kw、aa、oe、eo、yu，
+#     拼音的 zh、ch、sh、ng 等多字母音位各算一个），ngo → o 只差一个音位；
+#     查询时只沿三角不等式允许的分支下探，不必遍历全部读音
+#   * 声调另计：主体距离 + 声调不同时的 tone_cost（可设为 0 即不计声调），
+#     总距离仍不超过 max_distance 的读音才算命中
+#   * 中古全拼的声调本就写在拼式里（-x / -h 等），按普通音位计
+# 结果按 距离 → 字频名次 → 码位 排序。
+# 用法：python near_search.py 粤语 dung1 [--distance 1] [--tone-cost 1] [--limit 50]
+#       python near_search.py 广韵 --char 東
+import heapq
+import re
+import sys
+
+from query import LANG_MAP, get_pronunciations, resolve_glyphs
+from freq_table import RANK_BY_LANG, UNRANKED, rank_keys
+from reading_search import normalize, normalize_query
+
+DEFAULT_DISTANCE = 1
+DEFAULT_TONE_COST = 1
+
+# 各读音系统的音位切分：多字母音位写在前面，其余每个字母一个音位
+PHONEMES = {
+    "mandarin_pinyin": re.compile(r"zh|ch|sh|ng|."),
+    "cantonese_jyutping": re.compile(r"ng|gw|kw|aa|oe|eo|yu|."),
+    "polyhedron中古全拼": re.compile(r"ng|[ptkcg]h|."),
+}
+
+
+def phonemes(col, base):
+    """"ngaang" → ("ng", "aa", "ng")"""
+    return tuple(PHONEMES[col].findall(base))
+
+
+def edit_distance(a, b):
+    """Levenshtein 距离（插入 / 删除 / 替换各计 1），a、b 为字符串或音位序列"""
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+# ================================
+# BK 树
+# ================================
+class BKTree:
+    """节点为 [键, {距离 : 子节点}]"""
+    __slots__ = ("root", "size")
+
+    def __init__(self, keys=()):
+        self.root = None
+        self.size = 0
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        self.size += 1
+        if self.root is None:
+            self.root = [key, {}]
+            return
+        node = self.root
+        while True:
+            d = edit_distance(key, node[0])
+            if d == 0:
+                self.size -= 1
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [key, {}]
+                return
+            node = child
+
+    def search(self, key, radius):
+        """距离不超过 radius 的全部 (键, 距离)"""
+        out = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            word, children = stack.pop()
+            d = edit_distance(key, word)
+            if d <= radius:
+                out.append((word, d))
+            for dist, child in children.items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return out
+
+    def __getstate__(self):
+        return self.root, self.size
+
+    def __setstate__(self, state):
+        self.root, self.size = state
+
+
+def build_near_search(search):
+    """{读音列 : BKTree}，键为 reading_search 中不计声调的读音主体切成的音位序列"""
+    return {col: BKTree(sorted(phonemes(col, base) for base in s["toneless"]))
+            for col, s in search.items()}
+
+
+# ================================
+# 查询
+# ================================
+def near_readings(trees, search, names, col, queries,
+                  max_distance=DEFAULT_DISTANCE, tone_cost=DEFAULT_TONE_COST):
+    """
+    {读音 : 距离}：与 queries 中任一读音相近的全部读音（取最小距离；某个查询未写声调时不计声调差）。
+    names 为读音驻留表的名称列表（indexes["readings"].names）。
+    """
+    out = {}
+    for q in queries:
+        base, tone = normalize_query(col, q)
+        for key, d in trees[col].search(phonemes(col, base), max_distance):
+            for rid in search[col]["toneless"]["".join(key)]:
+                name = names[rid]
+                total = d
+                if tone and normalize(col, name)[1] != tone:
+                    total += tone_cost
+                if total <= max_distance:
+                    out[name] = min(total, out.get(name, total))
+    return out
+
+
+def rank_near(readings, pairs, table, system, exclude=(), limit=None):
+    """
+    readings 为 {读音 : 距离}，pairs 为这些读音下的 (读音, 字)；返回
+      [{"glyph": 字, "distance": 距离, "reading": 最近的读音}]
+    同一字取最小距离；按 距离 → 字频名次 → 码位 排序，limit 个即止。
+    """
+    best = {}
+    for name, g in pairs:
+        if g in exclude:
+            continue
+        d = readings[name]
+        if g not in best or (d, name) < best[g]:
+            best[g] = (d, name)
+
+    ranks = rank_keys(table, RANK_BY_LANG[system])
+
+    def key(g):
+        return best[g][0], ranks.get(g, UNRANKED), g
+
+    ordered = (heapq.nsmallest(limit, best, key=key) if limit is not None
+               else sorted(best, key=key))
+    return [{"glyph": g, "distance": best[g][0], "reading": best[g][1]} for g in ordered]
+
+
+def near_homophones(trees, search, indexes, table, system, q=None, char=None,
+                    max_distance=DEFAULT_DISTANCE, tone_cost=DEFAULT_TONE_COST,
+                    limit=None):
+    """近音字：q 为读音，或给 char 取其在该系统下的全部读音（见 rank_near）"""
+    col = LANG_MAP[system]
+    queries = [q] if q else get_pronunciations(indexes, char, col) if char else []
+    readings = near_readings(trees, search, indexes["readings"].names, col, queries,
+                             max_distance, tone_cost)
+
+    table_ids = indexes["readings"]
+    index = indexes["by_reading"][col]
+    glyphs = indexes["rows"].glyphs
+    pairs = ((name, glyphs[i]) for name in readings for i in index[table_ids.get(name)])
+    exclude = resolve_glyphs(indexes, char) if char else ()
+    return rank_near(readings, pairs, table, system, exclude, limit)
+
+
+def main(argv):
+    import argparse
+    import snapshot
+    parser = argparse.ArgumentParser(description="近音字查询")
+    parser.add_argument("system", choices=list(LANG_MAP))
+    parser.add_argument("reading", nargs="?")
+    parser.add_argument("--char")
+    parser.add_argument("--distance", type=int, default=DEFAULT_DISTANCE)
+    parser.add_argument("--tone-cost", type=float, default=DEFAULT_TONE_COST)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args(argv)
+    if not args.reading and not args.char:
+        parser.error("需要读音或 --char")
+
+    dataset = snapshot.load_dataset()
+    results = near_homophones(
+        dataset["near_search"], dataset["reading_search"], dataset["indexes"],
+        dataset["freq_table"], args.system, args.reading, args.char,
+        args.distance, args.tone_cost, args.limit
+    )
+    if not results:
+        print("没有相近的读音。")
+    by_distance = {}
+    for r in results:
+        by_distance.setdefault(r["distance"], []).append(f"{r['glyph']}({r['reading']})")
+    for d, items in sorted(by_distance.items()):
+        print(f"距离 {d:g}：{' '.join(items)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,240 @@
+# query.py
+# 广韵 + 普通话 + 粤语 读音表的共享查询层：
+# 读表、建索引只做一次，app.py 与命令行脚本共用。
+import csv
+import json
+import os
+from collections import defaultdict
+
+from model import Column, MiddleRecord, MIDDLE_COLUMNS, Record, RecordStore, READING_ATTRS
+from freq_table import RANK_BY_LANG, percentile_rank, select_glyphs
+
+CSV_PATH = "guangyun_with_all_readings.csv"
+ALIASES_PATH = "variant_aliases.json"
+
+LANG_MAP = {
+    "普通话": "mandarin_pinyin",
+    "粤语": "cantonese_jyutping",
+    "广韵": "polyhedron中古全拼",
+}
+
+
+# ================================
+# 读取基础广韵 + 拼音数据
+# ================================
+def load_data(path):
+    rows = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for r in reader:
+            rows.append(r)
+    return rows
+
+
+def load_aliases(path=ALIASES_PATH):
+    """异体别名表 {表外异体字 : "表内对应字…"}；文件缺失时为空"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ================================
+# 建立索引
+# ================================
+def build_indexes(rows, aliases=None):
+    """
+    rows 为 CSV 字典行，先解析成列式 RecordStore，再建索引。返回：
+      rows                      RecordStore（rows[i] 为 Record 视图）
+      readings                  读音驻留表（字符串 ⇄ ID）
+      by_reading[列][读音 ID]  = (行号, ...)
+      glyph_rows[字]            = (行号, ...)
+      aliases[异体字]           = "表内对应字…"（表外的异体字；表内的简体字则为其繁体来源）
+    """
+    store = RecordStore(rows)
+
+    glyph_rows = defaultdict(list)
+    for i, g in enumerate(store.glyphs):
+        glyph_rows[g].append(i)
+
+    by_reading = {}
+    for col, attr in READING_ATTRS.items():
+        column = store.columns[attr]
+        inverted = [[] for _ in range(len(store.readings))]
+        for i in range(len(store)):
+            for rid in column[i]:
+                inverted[rid].append(i)
+        index = Column()
+        for ids in inverted:
+            index.append(ids)
+        by_reading[col] = index
+
+    return {
+        "rows": store,
+        "readings": store.readings,
+        "by_reading": by_reading,
+        "glyph_rows": {g: tuple(ids) for g, ids in glyph_rows.items()},
+        "aliases": dict(aliases or {}),
+    }
+
+
+_loaded = {}
+
+def get_indexes(path=CSV_PATH):
+    """按路径缓存：同一进程内只读一次 CSV"""
+    if path not in _loaded:
+        _loaded[path] = build_indexes(load_data(path), load_aliases())
+    return _loaded[path]
+
+
+# ================================
+# 单字查询
+# ================================
+def resolve_glyphs(indexes, char):
+    """
+    字 → 表内字形：表外的字经异体别名表（可能有多个）；表内的字为其本身，
+    另加以它为简体的繁体字（如 只 → 只、隻），只取这些繁体字的中古音（见 reading_glyphs）。都没有则为空
+    """
+    targets = tuple(indexes.get("aliases", {}).get(char, ""))
+    if char in indexes["glyph_rows"]:
+        return (char, *targets)
+    return targets
+
+
+def reading_glyphs(resolved, char, col):
+    """
+    col 列读音取自哪些字形（resolved 为 resolve_glyphs 的结果）：
+    表内的字的现代读音只取其本身，繁体来源只并入中古音，与原先复制繁体行的中古音各列时一致
+    """
+    if col not in MIDDLE_COLUMNS and resolved[:1] == (char,):
+        return resolved[:1]
+    return resolved
+
+
+def lookup(indexes, char):
+    """
+    字 → 该字的全部记录（本身在前）：表外的字取异体别名表中对应字的记录；
+    表内的字另附其繁体来源的记录，但只含中古音各列（MiddleRecord）
+    """
+    store, glyph_rows = indexes["rows"], indexes["glyph_rows"]
+    own = char in glyph_rows
+    return [
+        (Record if g == char or not own else MiddleRecord)(store, i)
+        for g in resolve_glyphs(indexes, char) for i in glyph_rows[g]
+    ]
+
+
+def get_pronunciations(indexes, char, key):
+    """字在某一读音列下的全部读音（去重、排序）"""
+    return sorted({p for r in lookup(indexes, char) for p in r.reading_names(key)})
+
+
+def homophones(indexes, readings, key):
+    """某一读音列下读作 readings 中任一读音的全部字（按码位排序）"""
+    table = indexes["readings"]
+    index = indexes["by_reading"][key]
+    glyphs = indexes["rows"].glyphs
+    return sorted({
+        glyphs[i]
+        for rid in map(table.get, readings) if rid is not None
+        for i in index[rid]
+    })
+
+
+def group_by_reading(indexes, glyphs, key):
+    """{读音 : [字]}：把 glyphs 按其在 key 列下的读音分组"""
+    store = indexes["rows"]
+    column = store.columns[READING_ATTRS[key]]
+    names = store.readings.names
+    glyph_rows = indexes["glyph_rows"]
+
+    group = defaultdict(set)
+    for g in glyphs:
+        for i in glyph_rows.get(g, ()):
+            for rid in column[i]:
+                group[names[rid]].add(g)
+    return {k: sorted(v) for k, v in sorted(group.items())}
+
+
+def fold_groups(indexes, glyphs):
+    """
+    {"中古全拼（广韵信息）" : "字字…"}：目标语言为广韵时的折叠分组。
+    按原表行序遍历，保持分组内字序与逐行扫描一致。
+    """
+    rows, glyph_rows = indexes["rows"], indexes["glyph_rows"]
+    fold = defaultdict(list)
+    for i in sorted(i for g in glyphs for i in glyph_rows.get(g, ())):
+        r = rows[i]
+        for mid, pos in r.fold_pairs():
+            fold[(mid, pos)].append(r.glyph)
+    return {
+        f"{mid}（{pos}）": "".join(lst)
+        for (mid, pos), lst in fold.items()
+    }
+
+
+# ================================
+# 跨系统查询
+# ================================
+def common_filter(from_lang, mandarin_freq, cantonese_freq):
+    """根据源语言决定用哪个字频过滤；返回判定函数，不需过滤时返回 None"""
+    if from_lang == "普通话":
+        return lambda g: mandarin_freq.get(g, 0) > 0
+    if from_lang == "粤语":
+        return lambda g: cantonese_freq.get(g, 0) > 0
+    # 广韵 → 只要出现在广韵数据中即可
+    return None
+
+
+def compare_readings(indexes, from_lang, to_lang, readings, common=None):
+    """给定源语言读音（已排序），求同音字及其在目标语言中的分组"""
+    col_from = LANG_MAP[from_lang]
+    col_to = LANG_MAP[to_lang]
+
+    same_sound = homophones(indexes, readings, col_from)
+    if common is not None:
+        same_sound = [g for g in same_sound if common(g)]
+
+    # 目标语言 = 广韵 → 特殊折叠格式
+    if to_lang == "广韵":
+        return {
+            "mode": "to_guangyun_fold",
+            "readings": readings,
+            "same_sound": same_sound,
+            "groups_folded": fold_groups(indexes, same_sound)
+        }
+
+    return {
+        "mode": "normal",
+        "readings": readings,
+        "same_sound": same_sound,
+        "groups": group_by_reading(indexes, same_sound, col_to)
+    }
+
+
+def rank_result(table, result, from_lang, ranking):
+    """
+    按字频名次重排同音字及各分组（不修改原结果）。
+    ranking = (rank_by, min_freq, percentile, limit)，rank_by 为 "auto" 时按源语言取字频列；
+    limit 对同音字与每个分组分别生效。
+    """
+    if "error" in result:
+        return result
+    rank_by, min_freq, percentile, limit = ranking
+    col = RANK_BY_LANG[from_lang] if rank_by == "auto" else rank_by
+    max_rank = percentile_rank(table, col, percentile) if percentile is not None else None
+
+    def select(glyphs):
+        return select_glyphs(table, glyphs, col, min_freq, max_rank, limit)
+
+    ranked = dict(result)
+    ranked["rank_by"] = col
+    ranked["same_sound_total"] = len(result["same_sound"])
+    ranked["same_sound"] = select(result["same_sound"])
+    if "groups_folded" in result:
+        folded = {k: "".join(select(v)) for k, v in result["groups_folded"].items()}
+        ranked["groups_folded"] = {k: v for k, v in folded.items() if v}
+    else:
+        groups = {k: select(v) for k, v in result["groups"].items()}
+        ranked["groups"] = {k: v for k, v in groups.items() if v}
+    return ranked
@@ -0,0 +1,250 @@
+# reading_search.py
+# 按读音查字：
+#   * 前缀 / 精确查询：读音规范化后（声调并入末尾数字）建字典树
+#   * 不计声调查询：toneless 索引
+#   * 声母 / 韵母 / 声调 分解索引，多条件取交集
+# 粤拼的分解取自 list.tsv 的 INIT / FINL / TONE 列，表中没有的读音按规则切分；
+# 拼音先把调号转成数字（dōng → dong1，ü 记作 v），再切声母韵母。
+# 中古全拼只支持前缀 / 精确查询（音韵地位查询见广韵信息）。
+import re
+import unicodedata
+from collections import defaultdict
+
+JYUTPING_TSV = "list.tsv"
+
+TONE_MARKS = {"̄": "1", "́": "2", "̌": "3", "̀": "4"}
+
+PINYIN_INITIALS = ("zh", "ch", "sh", "b", "p", "m", "f", "d", "t", "n", "l",
+                   "g", "k", "h", "j", "q", "x", "r", "z", "c", "s", "y", "w")
+
+JYUTPING_RE = re.compile(r"^(ng|gw|kw|[bpmfdtnlgkhzcsjw])?([a-z]+)([1-6])$")
+SYLLABIC_RE = re.compile(r"^(m|ng)([1-6])$")
+
+
+# ================================
+# 规范化与分解
+# ================================
+def normalize_pinyin(s):
+    """"dōng" / "dong1" / "lü" / "lu:3" → ("dong", "1") / ("lv", "")；无调号时声调为空"""
+    s = s.strip().lower().replace("u:", "v")
+    tone = ""
+    if s and s[-1] in "012345":
+        s, tone = s[:-1], s[-1]
+    base = []
+    for ch in unicodedata.normalize("NFD", s):
+        if ch in TONE_MARKS:
+            tone = TONE_MARKS[ch]
+        elif ch == "̈":          # ü 的分音符
+            if base and base[-1] == "u":
+                base[-1] = "v"
+        else:
+            base.append(ch)
+    return "".join(base).replace("ü", "v"), tone
+
+
+def normalize_jyutping(s):
+    s = s.strip().lower()
+    if s and s[-1].isdigit():
+        return s[:-1], s[-1]
+    return s, ""
+
+
+def split_pinyin(base):
+    for ini in PINYIN_INITIALS:
+        if base.startswith(ini) and len(base) > len(ini):
+            return ini, base[len(ini):]
+    return "", base
+
+
+def load_jyutping_parts(path=JYUTPING_TSV):
+    """list.tsv → {粤拼 : (声母, 韵母, 声调)}"""
+    parts = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 6 or cols[0] == "CH":
+                continue
+            jp, ini, fin, tone = cols[2:6]
+            if jp and fin and tone:
+                parts.setdefault(jp, (ini, fin, tone))
+    return parts
+
+
+def split_jyutping(reading, table):
+    if reading in table:
+        return table[reading]
+    m = SYLLABIC_RE.match(reading)
+    if m:
+        return "", m.group(1), m.group(2)
+    m = JYUTPING_RE.match(reading)
+    if m:
+        return m.group(1) or "", m.group(2), m.group(3)
+    return None
+
+
+def normalize_query(col, q):
+    """查询串 → (主体, 声调)；未写声调时声调为空（即不限声调）"""
+    if col == "mandarin_pinyin":
+        return normalize_pinyin(q)
+    if col == "cantonese_jyutping":
+        return normalize_jyutping(q)
+    return q.strip(), ""
+
+
+def normalize(col, reading):
+    """表中读音 → (主体, 声调)；拼音无调号者记为轻声 5"""
+    base, tone = normalize_query(col, reading)
+    if col == "mandarin_pinyin":
+        tone = tone or "5"
+    return base, tone
+
+
+# ================================
+# 字典树
+# ================================
+class ReadingTrie:
+    __slots__ = ("children", "rids")
+
+    def __init__(self):
+        self.children = {}
+        self.rids = []
+
+    def insert(self, key, rid):
+        node = self
+        for ch in key:
+            node = node.children.setdefault(ch, ReadingTrie())
+        node.rids.append(rid)
+
+    def find(self, prefix):
+        node = self
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def collect(self, limit=None):
+        """按键的字典序取出子树内全部读音 ID（limit 个即止）"""
+        out = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            out.extend(node.rids)
+            if limit is not None and len(out) >= limit:
+                return out[:limit]
+            stack.extend(node.children[k] for k in sorted(node.children, reverse=True))
+        return out
+
+    def __getstate__(self):
+        return self.children, self.rids
+
+    def __setstate__(self, state):
+        self.children, self.rids = state
+
+
+# ================================
+# 构建
+# ================================
+def build_reading_search(indexes, jyutping_path=JYUTPING_TSV):
+    """
+    返回 search[列] = {
+        "trie":     规范化读音（主体 + 声调数字）的字典树,
+        "toneless": {主体 : [读音 ID]},
+        "initial" / "final" / "tone": {成分 : {读音 ID}},
+    }
+    """
+    jyut_table = load_jyutping_parts(jyutping_path)
+    names = indexes["readings"].names
+
+    search = {}
+    for col, index in indexes["by_reading"].items():
+        trie = ReadingTrie()
+        toneless = defaultdict(list)
+        comps = {"initial": defaultdict(set), "final": defaultdict(set),
+                 "tone": defaultdict(set)}
+
+        for rid, name in enumerate(names):
+            if not index[rid]:
+                continue
+            base, tone = normalize(col, name)
+            trie.insert(base + tone, rid)
+            toneless[base].append(rid)
+
+            if col == "mandarin_pinyin":
+                ini, fin = split_pinyin(base)
+                parts = (ini, fin, tone)
+            elif col == "cantonese_jyutping":
+                parts = split_jyutping(name, jyut_table)
+            else:
+                parts = None
+            if parts:
+                for key, value in zip(("initial", "final", "tone"), parts):
+                    comps[key][value].add(rid)
+
+        search[col] = {
+            "trie": trie,
+            "toneless": {
+                base: sorted(rids, key=lambda r: normalize(col, names[r]))
+                for base, rids in toneless.items()
+            },
+            **{k: dict(v) for k, v in comps.items()},
+        }
+    return search
+
+
+# ================================
+# 查询
+# ================================
+def search_readings(search, names, col, q="", match="prefix",
+                    initial=None, final=None, tone=None, limit=None):
+    """
+    names 为读音驻留表的名称列表（indexes["readings"].names），读音 ID → 读音名。
+    match:
+      prefix   —— 规范化后的前缀（"dung" 命中 dung1…dung6，"dōng" 只命中 dong1）
+      toneless —— 不计声调的整音节
+      exact    —— 带声调的整音节
+    initial / final / tone 非空时再与对应分解索引取交集。
+    返回读音名列表（按规范化键排序）。
+    """
+    s = search[col]
+
+    candidates = None
+    if q:
+        base, q_tone = normalize_query(col, q)
+        if match == "toneless":
+            candidates = list(s["toneless"].get(base, ()))
+            if q_tone:
+                candidates = [r for r in candidates if normalize(col, names[r])[1] == q_tone]
+        elif match == "exact":
+            node = s["trie"].find(base + (q_tone or ("5" if col == "mandarin_pinyin" else "")))
+            candidates = list(node.rids) if node else []
+        else:
+            node = s["trie"].find(base + q_tone)
+            # 有成分条件时先取全集再过滤，否则直接按 limit 截断
+            has_comps = initial is not None or final is not None or tone is not None
+            candidates = node.collect(None if has_comps else limit) if node else []
+
+    for key, value in (("initial", initial), ("final", final), ("tone", tone)):
+        if value is None:
+            continue
+        if col == "mandarin_pinyin" and key != "tone":
+            value = normalize_pinyin(value)[0]
+        matched = s.get(key, {}).get(value, set())
+        if candidates is None:
+            candidates = sorted(matched, key=lambda r: normalize(col, names[r]))
+        else:
+            candidates = [r for r in candidates if r in matched]
+
+    candidates = candidates or []
+    if limit is not None:
+        candidates = candidates[:limit]
+    return [names[r] for r in candidates]
+
+
+def reading_glyphs(indexes, col, reading):
+    """某读音下的全部字（按码位排序）"""
+    rid = indexes["readings"].get(reading)
+    if rid is None:
+        return []
+    glyphs = indexes["rows"].glyphs
+    return sorted({glyphs[i] for i in indexes["by_reading"][col][rid]})
@@ -0,0 +1,150 @@
+# reload.py
+# 数据热重载：查询引擎连同其快照数据不可变、带版本号，数据重建后整体原子替换。
+#   * 设置 PJK_RELOAD_INTERVAL（秒，默认 0 即不轮询）后，后台线程定期比对源文件与快照文件的 (大小, 修改时间)，变了就在后台载入新引擎
+#     （快照过期时 load_dataset 会顺带重建并写出快照；本进程写出的快照不算新变化）
+#   * 载入失败时保留原先的记录，下一轮照旧重试
+#   * 管理信号：SIGUSR2 或 POST /api/reload 立即重载（即使文件未变）
+#   * 替换只是一次引用赋值；请求开始时取定引擎，处理中的请求始终用旧数据，服务不中断
+#   * 多个 worker 同时发现变化时由文件锁串行化：只有第一个真正重建快照，其余等它写完直接载入
+import os
+import signal
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有 flock，各进程各自重建
+    fcntl = None
+
+RELOAD_INTERVAL = float(os.environ.get("PJK_RELOAD_INTERVAL", "0"))
+RELOAD_SIGNAL = getattr(signal, "SIGUSR2", None)
+
+
+def file_stamps(paths):
+    """各文件的 (路径, 大小, 修改时间)；缺失的文件记为 None"""
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            stamps.append((path, None, None))
+        else:
+            stamps.append((path, st.st_size, st.st_mtime_ns))
+    return tuple(stamps)
+
+
+@contextmanager
+def file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Reloader:
+    """
+    持有当前引擎；load() 构造新引擎，on_swap(old, new) 在替换后调用。
+    outputs 为 paths 中 load() 自己可能写出的文件（快照），载入成功后按写出后的状态记录。
+    interval <= 0 时不轮询，只响应信号 / request_reload()。
+    """
+
+    def __init__(self, current, load, paths, lock_path, on_swap=None,
+                 interval=RELOAD_INTERVAL, outputs=()):
+        self.current = current
+        self.load = load
+        self.paths = tuple(paths)
+        self.outputs = frozenset(outputs)
+        self.lock_path = lock_path
+        self.on_swap = on_swap
+        self.interval = interval
+        self.reloads = 0
+        self.loaded_at = time.time()
+        self.last_error = None
+        self._stamps = file_stamps(self.paths)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    # ---------- 重载 ----------
+    def check(self, force=False):
+        """文件有变（或 force）时载入新引擎并替换；返回是否发生了替换"""
+        with self._lock:
+            stamps = file_stamps(self.paths)
+            if not force and stamps == self._stamps:
+                return False
+            try:
+                with file_lock(self.lock_path):
+                    new = self.load()
+            except Exception:
+                # 不记下这次的状态，下一轮再试
+                self.last_error = traceback.format_exc(limit=3)
+                return False
+            self.last_error = None
+            # 源文件记载入前的状态：载入期间若又变了，下一轮还会再检查到；
+            # 载入时写出的快照则记写出后的状态，免得下一轮把它当成新变化再载一遍
+            self._stamps = tuple(
+                file_stamps((stamp[0],))[0] if stamp[0] in self.outputs else stamp
+                for stamp in stamps
+            )
+
+            old = self.current
+            if new.version == old.version and not force:
+                return False
+            self.current = new
+            self.reloads += 1
+            self.loaded_at = time.time()
+        if self.on_swap is not None:
+            self.on_swap(old, new)
+        return True
+
+    def request_reload(self):
+        """异步重载（信号处理函数里也可调用）"""
+        self._wake.set()
+
+    # ---------- 后台线程 ----------
+    def start(self):
+        """每个进程启动一次（fork 出的 worker 里线程不会继承，按 pid 判断）"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # fork 前的 Event 可能处于不一致状态，换一个新的，但保留尚未处理的重载请求
+            pending = self._wake.is_set()
+            self._wake = threading.Event()
+            if pending:
+                self._wake.set()
+            threading.Thread(target=self._run, name="pjk-reload", daemon=True).start()
+
+    def install_signal(self):
+        """只能在主线程注册；注册不了（或平台无 SIGUSR2）时静默跳过"""
+        if RELOAD_SIGNAL is None:
+            return
+        try:
+            signal.signal(RELOAD_SIGNAL, lambda signum, frame: self.request_reload())
+        except ValueError:
+            pass
+
+    def _run(self):
+        wake = self._wake
+        while True:
+            woke = wake.wait(self.interval if self.interval > 0 else None)
+            wake.clear()
+            self.check(force=woke)
+
+    def status(self):
+        return {
+            "version": self.current.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "interval": self.interval,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,57 @@
+# search_category.py
+# 按中古音韵地位查字：
+#   python search_category.py 声调=入 等=三 呼=合 声母=章组
+#   python search_category.py tone=入 rhyme=東,冬 --breakdown 普通话,粤语
+import sys
+
+from query import LANG_MAP
+from category_search import ATTR_KEYS, category_breakdown, parse_conditions, search_categories
+from snapshot import load_dataset
+
+
+def search_category(conds, dataset=None):
+    """用快照里现成的位图索引查字（不必每次重新解析 CSV、重建索引）"""
+    if dataset is None:
+        dataset = load_dataset()
+    indexes = dataset["indexes"]
+    return indexes, search_categories(dataset["categories"], indexes, conds)
+
+
+def print_results(indexes, results, breakdown):
+    if not results:
+        print("没有符合条件的字。")
+        return
+    print(f"共 {len(results)} 字：{''.join(r['glyph'] for r in results)}")
+    for system in breakdown:
+        print(f"\n📘 {system}读音分布：")
+        groups = category_breakdown(indexes, [r["glyph"] for r in results], (system,))[system]
+        for pron, chars in groups.items():
+            print(f"  {pron}: {''.join(chars)}")
+
+
+def main(argv):
+    params, breakdown = {}, ()
+    args = iter(argv)
+    for arg in args:
+        if arg == "--breakdown":
+            breakdown = tuple(s for s in next(args, "").split(",") if s)
+        elif "=" in arg:
+            key, value = arg.split("=", 1)
+            params[key] = value
+    conds = parse_conditions(params)
+    unknown = [s for s in breakdown if s not in LANG_MAP]
+    if not conds or unknown:
+        print("用法: python search_category.py 条件=值[,值] ... [--breakdown 普通话,粤语]")
+        print("条件：" + "、".join(f"{v}（{k}）" for k, v in ATTR_KEYS.items())
+              + "；同一条件多个值取并集，不同条件取交集")
+        return
+    try:
+        indexes, results = search_category(conds)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print_results(indexes, results, breakdown)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,24 +1,33 @@
-import csv
 import sys
 
-CSV_PATH = "guangyun_with_all_readings.csv"
+from query import lookup
+from snapshot import load_dataset
 
-def search_character(char):
-    results = []
-    with open(CSV_PATH, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row["glyph"] == char:
-                results.append(row)
-    return results
+def search_character(char, indexes=None):
+    """读预编译快照（不必每次重新解析 CSV）查字"""
+    if indexes is None:
+        indexes = load_dataset()["indexes"]
+    return lookup(indexes, char)
+
+def variant_note(results, char):
+    """经异体别名查得时的说明（同网页）；直接查到本字时为 None"""
+    others = "、".join(dict.fromkeys(r["glyph"] for r in results if r["glyph"] != char))
+    if not others:
+        return None
+    if results[0]["glyph"] != char:
+        return f"「{char}」不在广韵字表中，按其异体字 {others} 查得"
+    return f"「{char}」另并入其繁体字 {others} 的中古音（广韵地位、反切、中古全拼）"
 
 def print_results(results, char):
     if not results:
         print(f"没找到「{char}」的记录。")
         return
+    note = variant_note(results, char)
+    if note:
+        print(f"ℹ️ {note}")
     print(f"查询结果（{char}）：")
     for i, r in enumerate(results, 1):
-        print(f"Unicode: {r['unicode']}")
+        print(f"Unicode: {r['unicode']}" + (f"（{r['glyph']}）" if r["glyph"] != char else ""))
         print(f"普通话拼音:\n{r.get('mandarin_pinyin', '')}")
         print(f"粤拼 Jyutping:\n{r.get('cantonese_jyutping', '')}")
         print(f"Polyhedron 中古全拼:\n{r.get('polyhedron中古全拼', '')}")
@@ -27,6 +36,10 @@ def print_results(results, char):
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("用法: python search_character.py 汉字")
+        print("      python search_character.py --batch [文件] [--format jsonl|csv]（批量，读 stdin 或文件）")
+    elif sys.argv[1] == "--batch":
+        import bulk
+        bulk.main(sys.argv[2:], lookup=True, directions="")
     else:
         char = sys.argv[1]
         results = search_character(char)
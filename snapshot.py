@@ -0,0 +1,251 @@
+# snapshot.py
+# 预编译数据快照：rows + 索引 + 字频 等各部分分段序列化，免去 CSV / JSON 解析与建索引。
+#   * 文件布局：MAGIC | 头部长度 | 头部（版本、源文件指纹与 (大小, 修改时间)、各段位置）| 各段
+#   * 读取时只解析头部，整个文件 mmap；各段首次取用时才反序列化（见 LazySections），
+#     同音字表这类大的派生结构按方向再分段，启动时一段都不必读
+#   * 源文件的 (大小, 修改时间) 与头部记录一致时不再重算指纹
+import gc
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+from collections.abc import Mapping
+
+from atomic import atomic_write
+from freq_table import FREQ_TABLE_PATH, load_freq_table, freq_dict
+from query import ALIASES_PATH, CSV_PATH, load_aliases, load_data, build_indexes
+from homophone_map import build_homophone_map
+from reading_search import JYUTPING_TSV, build_reading_search
+from category_search import build_category_index
+from correspondence import build_correspondence
+from fanqie import build_fanqie_index
+from near_search import build_near_search
+
+SNAPSHOT_PATH = "guangyun.snapshot"
+SNAPSHOT_VERSION = 15
+MAGIC = b"PJKSNAP\0"
+HEADER = struct.Struct("<Q")
+
+# 按子键再分段的部分（同音字表按 (源语言, 目标语言, 只显示常用字) 分段）
+SPLIT_SECTIONS = ("homophones",)
+
+SOURCES = (CSV_PATH, FREQ_TABLE_PATH, JYUTPING_TSV, ALIASES_PATH)
+
+
+# ================================
+# 源文件指纹（判断快照是否过期）
+# ================================
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_digests(sources=SOURCES):
+    return {p: file_digest(p) for p in sources}
+
+
+def source_stamps(sources=SOURCES):
+    """{路径 : (大小, 修改时间)}：与快照记录的一致时视为未变，不必重算指纹"""
+    stamps = {}
+    for p in sources:
+        st = os.stat(p)
+        stamps[p] = (st.st_size, st.st_mtime_ns)
+    return stamps
+
+
+def data_version(digests):
+    """数据版本号：源文件指纹的摘要，数据不变则版本不变（可作缓存纪元）"""
+    h = hashlib.sha1()
+    for p in sorted(digests):
+        h.update(digests[p].encode())
+    return h.hexdigest()[:12]
+
+
+# ================================
+# 从源文件构建
+# ================================
+def build_dataset(csv_path=CSV_PATH,
+                  freq_path=FREQ_TABLE_PATH,
+                  jyutping_path=JYUTPING_TSV,
+                  aliases_path=ALIASES_PATH):
+    table = load_freq_table(freq_path)
+    mandarin_freq = freq_dict(table, "mandarin")
+    cantonese_freq = freq_dict(table, "cantonese")
+
+    digests = source_digests((csv_path, freq_path, jyutping_path, aliases_path))
+    indexes = build_indexes(load_data(csv_path), load_aliases(aliases_path))
+    reading_search = build_reading_search(indexes, jyutping_path)
+    categories = build_category_index(indexes)
+    return {
+        "version": data_version(digests),
+        "indexes": indexes,
+        "freq_table": table,
+        "mandarin_freq": mandarin_freq,
+        "cantonese_freq": cantonese_freq,
+        "homophones": build_homophone_map(indexes, mandarin_freq, cantonese_freq),
+        "reading_search": reading_search,
+        "near_search": build_near_search(reading_search),
+        "categories": categories,
+        "correspondence": build_correspondence(
+            indexes, categories, reading_search, mandarin_freq, cantonese_freq
+        ),
+        "fanqie": build_fanqie_index(indexes),
+    }
+
+
+# ================================
+# 写出 / 读取
+# ================================
+class LazySections(Mapping):
+    """快照读出的数据集（或其中分段的部分）：按键取用时才从 mmap 的文件里反序列化该段"""
+
+    def __init__(self, buf, sections):
+        self._buf = buf
+        self._sections = sections
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        try:
+            return self._loaded[key]
+        except KeyError:
+            pass
+        entry = self._sections[key]
+        with self._lock:
+            if key not in self._loaded:
+                if isinstance(entry, dict):
+                    value = LazySections(self._buf, entry)
+                else:
+                    offset, length = entry
+                    value = unpickle(self._buf[offset:offset + length])
+                self._loaded[key] = value
+        return self._loaded[key]
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self):
+        return len(self._sections)
+
+
+def unpickle(data):
+    # 反序列化大量小对象时关掉 GC，避免反复扫描
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(data)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def write_snapshot(path=SNAPSHOT_PATH, dataset=None):
+    """构建并原子写出快照"""
+    if dataset is None:
+        dataset = build_dataset()
+
+    blobs, written = [], {}
+    size = 0
+
+    def section(value):
+        # 同一对象（如广韵为源时常用 / 全部两张同音字表）只写一次
+        nonlocal size
+        if id(value) not in written:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            written[id(value)] = (size, len(blob))
+            blobs.append(blob)
+            size += len(blob)
+        return written[id(value)]
+
+    sections = {}
+    for name, value in dataset.items():
+        if name in SPLIT_SECTIONS:
+            sections[name] = {key: section(part) for key, part in value.items()}
+        else:
+            sections[name] = section(value)
+
+    header = pickle.dumps({
+        "version": SNAPSHOT_VERSION,
+        "sources": source_digests(),
+        "stamps": source_stamps(),
+        "sections": sections,
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+    with atomic_write(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    return dataset
+
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        return None
+    (length,) = HEADER.unpack(f.read(HEADER.size))
+    header = pickle.loads(f.read(length))
+    return header if header.get("version") == SNAPSHOT_VERSION else None
+
+
+def is_fresh(header):
+    """源文件 (大小, 修改时间) 未变，或虽被改写但内容指纹仍一致"""
+    try:
+        if header["stamps"] == source_stamps():
+            return True
+        return header["sources"] == source_digests()
+    except FileNotFoundError:
+        return False
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """快照缺失、版本不符或源文件已变 → 返回 None；否则返回按需反序列化的 LazySections"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        try:
+            header = read_header(f)
+        except Exception:
+            return None
+        if header is None or not is_fresh(header):
+            return None
+        base = f.tell()
+        if os.name == "nt":
+            # Windows 上被映射的文件不能被 os.replace 覆盖，重建快照时会失败：整体读入内存
+            buf = memoryview(f.read())
+        else:
+            buf = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    # 映射在文件关闭、甚至被新快照替换后仍然有效（仍指向旧文件）
+    return LazySections(buf[base:], header["sections"])
+
+
+def load_dataset(path=SNAPSHOT_PATH, write_back=True):
+    """优先读快照；否则回退到 CSV + 字频表，并尽量顺手写出新快照"""
+    dataset = load_snapshot(path)
+    if dataset is not None:
+        return dataset
+
+    dataset = build_dataset()
+    if write_back:
+        try:
+            write_snapshot(path, dataset)
+        except OSError:
+            # 只读文件系统等情况：保持 CSV 回退即可
+            pass
+    return dataset
+
+
+def main():
+    write_snapshot()
+    print(f"✅ 已生成 {SNAPSHOT_PATH}（版本 {SNAPSHOT_VERSION}）")
+
+
+if __name__ == "__main__":
+    main()
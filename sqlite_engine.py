@@ -0,0 +1,482 @@
+# sqlite_engine.py
+# 可选的 SQLite 存储引擎：规范化表 + 索引，查询走 SQL。
+# 各 worker 只持有一个只读连接池，数据页通过 mmap 由操作系统在进程间共享，
+# 不必在每个进程里各存一份完整数据。结果与内存引擎逐项一致。
+# 读音查询 / 音韵地位 / 近音字 / 对应统计 / 反切系联所需的专用索引（字典树、位图、BK 树等）
+# 各自序列化存在 section 表里，首次用到时只载入该功能的那一份，涉及字的部分仍走 SQL。
+import json
+import os
+import pickle
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from query import LANG_MAP, reading_glyphs
+from model import COLUMNS, FIELDS, READING_ATTRS
+from freq_table import load_freq_table
+from reading_search import search_readings
+from category_search import category_hits
+from correspondence import contingency
+from fanqie import KINDS, class_detail, class_rows, fanqie_items, speller_classes
+from near_search import near_readings, rank_near
+import snapshot
+
+DB_PATH = "guangyun.db"
+SCHEMA_VERSION = 2
+POOL_SIZE = int(os.environ.get("PJK_SQLITE_POOL", "4"))
+MMAP_SIZE = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE glyph (
+    id      INTEGER PRIMARY KEY,   -- 原表行号
+    glyph   TEXT NOT NULL,
+    unicode TEXT NOT NULL
+);
+-- 三套读音：system 为原 CSV 列名
+CREATE TABLE reading (
+    glyph_id INTEGER NOT NULL REFERENCES glyph(id),
+    system   TEXT NOT NULL,
+    pos      INTEGER NOT NULL,
+    reading  TEXT NOT NULL
+);
+-- 中古音地位：广韵信息 / 反切 / 中古全拼 按行对齐（行数不齐时以 NULL 补位）
+CREATE TABLE mc (
+    glyph_id INTEGER NOT NULL REFERENCES glyph(id),
+    pos      INTEGER NOT NULL,
+    info     TEXT,
+    fanqie   TEXT,
+    middle   TEXT
+);
+-- 异体别名：异体字 → 表内对应字（pos 为优先次序；表内简体字 → 其繁体来源）
+CREATE TABLE alias (
+    alias  TEXT NOT NULL,
+    pos    INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    PRIMARY KEY (alias, pos)
+) WITHOUT ROWID;
+CREATE TABLE freq (
+    glyph     TEXT PRIMARY KEY,
+    mandarin  INTEGER NOT NULL DEFAULT 0,
+    cantonese INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+-- 各功能的专用索引（pickle），见 SECTIONS
+CREATE TABLE section (
+    name TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+INDEXES = """
+CREATE INDEX glyph_by_glyph ON glyph(glyph);
+CREATE INDEX reading_by_reading ON reading(system, reading, glyph_id);
+CREATE INDEX reading_by_glyph ON reading(glyph_id, system, pos);
+CREATE INDEX mc_by_glyph ON mc(glyph_id, pos);
+"""
+
+FREQ_COLUMN = {"普通话": "mandarin", "粤语": "cantonese"}
+
+# section 名 → 从内存数据集取出该部分（只含按行号 / 读音 ID 编址的结构，不含整张表）
+SECTIONS = {
+    "reading_search": lambda d: {"search": d["reading_search"],
+                                 "names": d["indexes"]["readings"].names},
+    "near_search": lambda d: d["near_search"],
+    "categories": lambda d: d["categories"],
+    "correspondence": lambda d: d["correspondence"],
+    "fanqie": lambda d: d["fanqie"],
+}
+
+
+# ================================
+# 建库
+# ================================
+def build_database(dataset, path=DB_PATH):
+    """由内存数据集生成数据库（先写临时文件再 rename，多 worker 并发建库也安全）"""
+    indexes = dataset["indexes"]
+    store = indexes["rows"]
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", (
+            ("schema", str(SCHEMA_VERSION)), ("snapshot", str(snapshot.SNAPSHOT_VERSION)),
+            ("version", dataset["version"])
+        ))
+        conn.executemany(
+            "INSERT INTO glyph VALUES (?, ?, ?)",
+            ((i, r.glyph, r.unicode) for i, r in enumerate(store))
+        )
+        conn.executemany(
+            "INSERT INTO reading VALUES (?, ?, ?, ?)",
+            (
+                (i, col, pos, p)
+                for i, r in enumerate(store)
+                for col in READING_ATTRS
+                for pos, p in enumerate(r.reading_names(col))
+            )
+        )
+
+        def mc_rows():
+            for i, r in enumerate(store):
+                info, fanqie, middle = (
+                    r.lines("广韵信息"), r.lines("反切"), r.lines("polyhedron中古全拼")
+                )
+                for pos in range(max(len(info), len(fanqie), len(middle))):
+                    yield (
+                        i, pos,
+                        info[pos] if pos < len(info) else None,
+                        fanqie[pos] if pos < len(fanqie) else None,
+                        middle[pos] if pos < len(middle) else None,
+                    )
+
+        conn.executemany("INSERT INTO mc VALUES (?, ?, ?, ?, ?)", mc_rows())
+
+        conn.executemany(
+            "INSERT INTO alias VALUES (?, ?, ?)",
+            (
+                (a, pos, t)
+                for a, targets in sorted(indexes["aliases"].items())
+                for pos, t in enumerate(targets)
+            )
+        )
+
+        mandarin, cantonese = dataset["mandarin_freq"], dataset["cantonese_freq"]
+        conn.executemany(
+            "INSERT INTO freq VALUES (?, ?, ?)",
+            ((g, mandarin.get(g, 0), cantonese.get(g, 0))
+             for g in sorted(set(mandarin) | set(cantonese)))
+        )
+        conn.executemany(
+            "INSERT INTO section VALUES (?, ?)",
+            ((name, pickle.dumps(get(dataset), protocol=pickle.HIGHEST_PROTOCOL))
+             for name, get in SECTIONS.items())
+        )
+        conn.executescript(INDEXES)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+
+
+def database_version(path=DB_PATH):
+    """库内的数据版本；库缺失、损坏，或表结构 / 所存快照分段的格式版本不符时为 None"""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return None
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if (meta.get("schema") != str(SCHEMA_VERSION)
+                or meta.get("snapshot") != str(snapshot.SNAPSHOT_VERSION)):
+            return None
+        return meta.get("version")
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+
+
+# ================================
+# 只读连接池（每个进程各自一份，fork 后自动重建）
+# ================================
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._pid = None
+        self._idle = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+        )
+        conn.execute("PRAGMA query_only = 1")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._idle = queue.LifoQueue(maxsize=self.size)
+            idle = self._idle
+        try:
+            conn = idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            try:
+                idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+
+# ================================
+# 查询引擎
+# ================================
+class SQLiteEngine:
+    name = "sqlite"
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.version = snapshot.data_version(snapshot.source_digests())
+        if database_version(path) != self.version:
+            build_database(snapshot.load_dataset(), path)
+        self.pool = ConnectionPool(path)
+        self._dataset = None
+        self._freq_table = None
+        self._sections = {}
+
+    @property
+    def dataset(self):
+        """整段注音仍需完整的内存索引：首次用到时才加载"""
+        if self._dataset is None:
+            self._dataset = snapshot.load_dataset()
+        return self._dataset
+
+    @property
+    def freq_table(self):
+        """字频名次表（按字频排序时用），同样首次用到时才加载"""
+        if self._freq_table is None:
+            if self._dataset is not None:
+                self._freq_table = self._dataset["freq_table"]
+            else:
+                self._freq_table = load_freq_table()
+        return self._freq_table
+
+    def section(self, name):
+        """某一功能的专用索引（见 SECTIONS）：首次用到时从库中载入，各 worker 只载入用到的几份"""
+        data = self._sections.get(name)
+        if data is None:
+            with self.pool.connection() as conn:
+                (blob,) = conn.execute(
+                    "SELECT data FROM section WHERE name = ?", (name,)
+                ).fetchone()
+            data = self._sections[name] = pickle.loads(blob)
+        return data
+
+    @staticmethod
+    def _glyph_names(conn, ids):
+        """{行号 : 字}，只取给定的行"""
+        return dict(conn.execute(
+            "SELECT id, glyph FROM glyph WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(ids)),)
+        ))
+
+    @staticmethod
+    def _resolve(conn, char):
+        """字 → 表内字形（同 query.resolve_glyphs）"""
+        targets = tuple(t for (t,) in conn.execute(
+            "SELECT target FROM alias WHERE alias = ? ORDER BY pos", (char,)
+        ))
+        if conn.execute("SELECT 1 FROM glyph WHERE glyph = ? LIMIT 1", (char,)).fetchone():
+            return (char, *targets)
+        return targets
+
+    def resolve(self, char):
+        with self.pool.connection() as conn:
+            return self._resolve(conn, char)
+
+    def lookup(self, char):
+        with self.pool.connection() as conn:
+            resolved = self._resolve(conn, char)
+            ids = [
+                row
+                for glyph in resolved
+                for row in conn.execute(
+                    "SELECT id, glyph, unicode FROM glyph WHERE glyph = ? ORDER BY id",
+                    (glyph,)
+                )
+            ]
+            records = []
+            for gid, glyph, unicode in ids:
+                # 表内字的繁体来源只并入中古音（同 query.MiddleRecord）
+                modern = glyph in reading_glyphs(resolved, char, "mandarin_pinyin")
+                cells = {"glyph": glyph, "unicode": unicode}
+                mc = conn.execute(
+                    "SELECT info, fanqie, middle FROM mc WHERE glyph_id = ? ORDER BY pos",
+                    (gid,)
+                ).fetchall()
+                for j, col in enumerate(("广韵信息", "反切", "polyhedron中古全拼")):
+                    cells[col] = FIELDS[col][1].join(m[j] for m in mc if m[j] is not None)
+                for col in ("mandarin_pinyin", "cantonese_jyutping"):
+                    cells[col] = FIELDS[col][1].join(p for (p,) in conn.execute(
+                        "SELECT reading FROM reading WHERE glyph_id = ? AND system = ? "
+                        "ORDER BY pos", (gid, col)
+                    )) if modern else ""
+                records.append({k: cells[k] for k in COLUMNS})
+        return records
+
+    def readings(self, char, col):
+        with self.pool.connection() as conn:
+            glyphs = reading_glyphs(self._resolve(conn, char), char, col)
+            marks = ", ".join("?" * len(glyphs))
+            return [p for (p,) in conn.execute(
+                "SELECT DISTINCT r.reading FROM glyph g "
+                "JOIN reading r ON r.glyph_id = g.id "
+                f"WHERE g.glyph IN ({marks}) AND r.system = ? ORDER BY r.reading",
+                (*glyphs, col)
+            )]
+
+    def compare_readings(self, from_lang, to_lang, readings, filter_common):
+        col_from = LANG_MAP[from_lang]
+        col_to = LANG_MAP[to_lang]
+
+        # 同音字集合（可选字频过滤），作为 CTE 供后续分组复用
+        marks = ", ".join("?" * len(readings))
+        same_sql = (
+            "SELECT DISTINCT g.glyph FROM reading r "
+            "JOIN glyph g ON g.id = r.glyph_id "
+        )
+        freq_col = FREQ_COLUMN.get(from_lang) if filter_common else None
+        if freq_col:
+            same_sql += "JOIN freq f ON f.glyph = g.glyph "
+        same_sql += f"WHERE r.system = ? AND r.reading IN ({marks})"
+        if freq_col:
+            same_sql += f" AND f.{freq_col} > 0"
+        params = [col_from, *readings]
+
+        with self.pool.connection() as conn:
+            same_sound = [g for (g,) in conn.execute(
+                same_sql + " ORDER BY g.glyph", params
+            )]
+
+            if to_lang == "广韵":
+                fold = {}
+                for glyph, middle, info in conn.execute(
+                    f"WITH same(glyph) AS ({same_sql}) "
+                    "SELECT g.glyph, m.middle, m.info FROM same s "
+                    "JOIN glyph g ON g.glyph = s.glyph "
+                    "JOIN mc m ON m.glyph_id = g.id "
+                    "WHERE m.middle IS NOT NULL AND m.info IS NOT NULL "
+                    "ORDER BY g.id, m.pos", params
+                ):
+                    key = f"{middle}（{info}）"
+                    fold[key] = fold.get(key, "") + glyph
+                return {
+                    "mode": "to_guangyun_fold",
+                    "readings": readings,
+                    "same_sound": same_sound,
+                    "groups_folded": fold
+                }
+
+            groups = {}
+            for reading, glyph in conn.execute(
+                f"WITH same(glyph) AS ({same_sql}) "
+                "SELECT DISTINCT t.reading, s.glyph FROM same s "
+                "JOIN glyph g ON g.glyph = s.glyph "
+                "JOIN reading t ON t.glyph_id = g.id AND t.system = ? "
+                "ORDER BY t.reading, s.glyph", params + [col_to]
+            ):
+                groups.setdefault(reading, []).append(glyph)
+
+        return {
+            "mode": "normal",
+            "readings": readings,
+            "same_sound": same_sound,
+            "groups": groups
+        }
+
+    # ---------- 按读音 / 音韵地位查字、近音字、对应统计、反切系联 ----------
+    def search_readings(self, col, q, match="prefix", initial=None, final=None, tone=None,
+                        limit=None):
+        s = self.section("reading_search")
+        return search_readings(
+            s["search"], s["names"], col, q, match, initial, final, tone, limit
+        )
+
+    def reading_glyphs(self, col, reading):
+        with self.pool.connection() as conn:
+            return [g for (g,) in conn.execute(
+                "SELECT DISTINCT g.glyph FROM reading r "
+                "JOIN glyph g ON g.id = r.glyph_id "
+                "WHERE r.system = ? AND r.reading = ? ORDER BY g.glyph", (col, reading)
+            )]
+
+    def search_categories(self, conds):
+        hits = category_hits(self.section("categories"), conds)
+        with self.pool.connection() as conn:
+            glyphs = self._glyph_names(conn, hits)
+        return [{"glyph": glyphs[i], "status": status} for i, status in hits.items()]
+
+    def category_breakdown(self, glyphs, systems):
+        out = {}
+        with self.pool.connection() as conn:
+            for system in systems:
+                groups = {}
+                for reading, glyph in conn.execute(
+                    "SELECT DISTINCT r.reading, g.glyph FROM glyph g "
+                    "JOIN reading r ON r.glyph_id = g.id AND r.system = ? "
+                    "WHERE g.glyph IN (SELECT value FROM json_each(?)) "
+                    "ORDER BY r.reading, g.glyph",
+                    (LANG_MAP[system], json.dumps(list(glyphs), ensure_ascii=False))
+                ):
+                    groups.setdefault(reading, []).append(glyph)
+                out[system] = groups
+        return out
+
+    def near_homophones(self, system, q, char, max_distance, tone_cost, limit=None):
+        col = LANG_MAP[system]
+        queries = [q] if q else self.readings(char, col) if char else []
+        s = self.section("reading_search")
+        readings = near_readings(
+            self.section("near_search"), s["search"], s["names"], col, queries,
+            max_distance, tone_cost
+        )
+        with self.pool.connection() as conn:
+            pairs = conn.execute(
+                "SELECT DISTINCT r.reading, g.glyph FROM reading r "
+                "JOIN glyph g ON g.id = r.glyph_id "
+                "WHERE r.system = ? AND r.reading IN (SELECT value FROM json_each(?))",
+                (col, json.dumps(list(readings), ensure_ascii=False))
+            ).fetchall()
+        exclude = self.resolve(char) if char else ()
+        return rank_near(readings, pairs, self.freq_table, system, exclude, limit)
+
+    def contingency(self, mc_attr, lang, part, weight="glyphs", normalize=None):
+        return contingency(self.section("correspondence"), mc_attr, lang, part, weight, normalize)
+
+    def char_fanqie(self, char):
+        with self.pool.connection() as conn:
+            glyphs = self._resolve(conn, char)
+            ids = conn.execute(
+                "SELECT id, glyph FROM glyph "
+                "WHERE glyph IN (SELECT value FROM json_each(?)) ORDER BY id",
+                (json.dumps(glyphs, ensure_ascii=False),)
+            ).fetchall()
+            rows = [
+                (gid, glyph, [info for (info,) in conn.execute(
+                    "SELECT info FROM mc WHERE glyph_id = ? AND info IS NOT NULL ORDER BY pos",
+                    (gid,)
+                )])
+                for gid, glyph in ids
+            ]
+        return fanqie_items(self.section("fanqie"), rows)
+
+    def speller_classes(self, kind, speller):
+        return speller_classes(self.section("fanqie"), kind, speller)
+
+    def class_detail(self, kind, cid, limit=None):
+        fq = self.section("fanqie")
+        rows = class_rows(fq, kind, cid) if kind in KINDS else []
+        with self.pool.connection() as conn:
+            glyphs = self._glyph_names(conn, rows[:limit] if limit is not None else rows)
+        return class_detail(fq, glyphs, kind, cid, limit)
+
+
+if __name__ == "__main__":
+    dataset = snapshot.load_dataset()
+    build_database(dataset)
+    print(f"✅ 已生成 {DB_PATH}（数据版本 {dataset['version']}）")
@@ -0,0 +1,8 @@
+# tests/conftest.py
+# 各脚本按仓库根目录的相对路径读数据文件：测试一律在根目录下运行，并从根目录导入模块。
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
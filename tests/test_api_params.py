@@ -0,0 +1,24 @@
+# tests/test_api_params.py
+# 按读音 / 近音字 / 反切系联各接口的 limit：不是正整数时返回 400，而不是空结果或截断。
+import pytest
+
+from app import app
+
+ENDPOINTS = [
+    "/api/readings?system=普通话&q=dong",
+    "/api/near?system=粤语&q=ngo5",
+    "/api/fanqie?kind=upper&class=0",
+]
+
+
+@pytest.mark.parametrize("url", ENDPOINTS)
+@pytest.mark.parametrize("limit", ["0", "-1", "x"])
+def test_invalid_limit(url, limit):
+    resp = app.test_client().get(f"{url}&limit={limit}")
+    assert resp.status_code == 400
+    assert "limit" in resp.get_json()["error"]
+
+
+@pytest.mark.parametrize("url", ENDPOINTS)
+def test_valid_limit(url):
+    assert app.test_client().get(f"{url}&limit=1").status_code == 200
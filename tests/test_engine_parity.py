@@ -0,0 +1,91 @@
+# tests/test_engine_parity.py
+# 内存引擎与 SQLite 引擎逐项对拍：抽样的字（含表外异体字与查不到的字）× 全部 3×3 方向 × 是否过滤常用字。
+import pytest
+
+from engine import MemoryEngine
+from query import LANG_MAP
+from snapshot import load_dataset
+from sqlite_engine import SQLiteEngine
+
+STEP = 40
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return MemoryEngine(load_dataset()), SQLiteEngine()
+
+
+@pytest.fixture(scope="module")
+def sample(engines):
+    indexes = engines[0].indexes
+    glyphs = list(indexes["glyph_rows"])[::STEP]
+    aliases = sorted(indexes["aliases"])[::STEP]
+    return glyphs + aliases + ["東", "东", "只", "A", "〇"]
+
+
+def test_same_version(engines):
+    memory, sqlite = engines
+    assert memory.version == sqlite.version
+
+
+def test_lookup(engines, sample):
+    memory, sqlite = engines
+    for char in sample:
+        assert memory.resolve(char) == sqlite.resolve(char), char
+        assert [dict(r) for r in memory.lookup(char)] == sqlite.lookup(char), char
+
+
+def test_readings(engines, sample):
+    memory, sqlite = engines
+    for char in sample:
+        for col in LANG_MAP.values():
+            assert memory.readings(char, col) == sqlite.readings(char, col), (char, col)
+
+
+@pytest.mark.parametrize("from_lang", list(LANG_MAP))
+@pytest.mark.parametrize("to_lang", list(LANG_MAP))
+@pytest.mark.parametrize("filter_common", [False, True])
+def test_compare(engines, sample, from_lang, to_lang, filter_common):
+    memory, sqlite = engines
+    for char in sample:
+        readings = memory.readings(char, LANG_MAP[from_lang])
+        if not readings:
+            continue
+        assert (memory.compare_readings(from_lang, to_lang, readings, filter_common)
+                == sqlite.compare_readings(from_lang, to_lang, readings, filter_common)), char
+
+
+FEATURE_QUERIES = [
+    ("search_readings", ("mandarin_pinyin", "dong")),
+    ("search_readings", ("cantonese_jyutping", "dung", "toneless")),
+    ("search_readings", ("cantonese_jyutping", "", "prefix", "ng", None, "5")),
+    ("search_readings", ("polyhedron中古全拼", "tung", "prefix", None, None, None, 20)),
+    ("reading_glyphs", ("cantonese_jyutping", "dung1")),
+    ("search_categories", ({"声调": ["入"], "等": ["三"], "呼": ["合"], "声母": ["章組"]},)),
+    ("search_categories", ({"摄": ["通"]},)),
+    ("category_breakdown", (list("東同銅桐𠀀"), ("普通话", "粤语", "广韵"))),
+    ("near_homophones", ("粤语", "ngo5", None, 1, 1)),
+    ("near_homophones", ("普通话", None, "东", 2, 0.5, 30)),
+    ("near_homophones", ("广韵", None, "只", 1, 1)),
+    ("contingency", ("声调", "粤语", "tone")),
+    ("contingency", ("声母", "普通话", "initial", "freq", "row")),
+    ("char_fanqie", ("德",)),
+    ("char_fanqie", ("东",)),
+    ("speller_classes", ("lower", "紅")),
+    ("class_detail", ("upper", 0, 50)),
+    ("class_detail", ("lower", 3)),
+]
+
+
+@pytest.mark.parametrize("method, args", FEATURE_QUERIES)
+def test_features(engines, method, args):
+    memory, sqlite = engines
+    assert getattr(memory, method)(*args) == getattr(sqlite, method)(*args)
+
+
+def test_features_skip_full_dataset(engines):
+    """读音 / 音韵地位 / 近音字 / 对应统计 / 反切系联都不应载入整份快照"""
+    _, sqlite = engines
+    for method, args in FEATURE_QUERIES:
+        getattr(sqlite, method)(*args)
+    assert sqlite._dataset is None
@@ -0,0 +1,38 @@
+# tests/test_near_search.py
+# 近音字的距离按音位计：多字母音位（ng、gw、aa、zh……）只算一个。
+import pytest
+
+from app import app
+from near_search import edit_distance, near_readings, phonemes
+from snapshot import load_dataset
+
+
+@pytest.mark.parametrize("col, a, b, expected", [
+    ("cantonese_jyutping", "ngo", "o", 1),
+    ("cantonese_jyutping", "ngo", "ng", 1),
+    ("cantonese_jyutping", "gwong", "gong", 1),
+    ("cantonese_jyutping", "aam", "am", 1),
+    ("cantonese_jyutping", "soeng", "seng", 1),
+    ("mandarin_pinyin", "zhang", "zang", 1),
+    ("mandarin_pinyin", "shan", "sang", 2),
+    ("polyhedron中古全拼", "khang", "kang", 1),
+])
+def test_phoneme_distance(col, a, b, expected):
+    assert edit_distance(phonemes(col, a), phonemes(col, b)) == expected
+
+
+def test_near_readings():
+    dataset = load_dataset()
+    readings = near_readings(dataset["near_search"], dataset["reading_search"],
+                             dataset["indexes"]["readings"].names, "cantonese_jyutping",
+                             ["ngo5"], 1, 1)
+    assert readings["ngo5"] == 0
+    assert readings["o5"] == 1
+    assert readings["ngo1"] == 1
+    assert "o1" not in readings
+
+
+@pytest.mark.parametrize("tone_cost", ["nan", "inf", "-inf", "-1"])
+def test_api_rejects_tone_cost(tone_cost):
+    resp = app.test_client().get(f"/api/near?system=粤语&q=ngo5&tone_cost={tone_cost}")
+    assert resp.status_code == 400
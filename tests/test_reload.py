@@ -0,0 +1,75 @@
+# tests/test_reload.py
+# 热重载：载入失败后照旧重试；载入时自己写出的快照不再触发一次重载；开着重载时 HTTP 只给短缓存期。
+import os
+
+import app as app_module
+from reload import Reloader
+
+
+class Engine:
+    def __init__(self, version):
+        self.version = version
+
+
+def make_reloader(tmp_path, load):
+    source, output = tmp_path / "source.csv", tmp_path / "data.snapshot"
+    source.write_text("1")
+    output.write_text("1")
+    reloader = Reloader(Engine("v1"), load, (str(source), str(output)),
+                        str(tmp_path / "lock"), interval=0, outputs=(str(output),))
+    return reloader, source, output
+
+
+def touch(path, text):
+    path.write_text(text)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_failed_load_is_retried(tmp_path):
+    calls = []
+
+    def load():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("half-written")
+        return Engine("v2")
+
+    reloader, source, _ = make_reloader(tmp_path, load)
+    touch(source, "2")
+    assert not reloader.check()
+    assert reloader.last_error
+    assert reloader.check()
+    assert reloader.current.version == "v2" and reloader.last_error is None
+
+
+def test_own_snapshot_write_does_not_reload(tmp_path):
+    calls = []
+
+    def load():
+        calls.append(1)
+        touch(output, f"snapshot {len(calls)}")
+        return Engine(f"v{len(calls) + 1}")
+
+    reloader, source, output = make_reloader(tmp_path, load)
+    touch(source, "2")
+    assert reloader.check()
+    assert not reloader.check()
+    assert len(calls) == 1
+
+
+def test_short_max_age_while_reloading(monkeypatch):
+    client = app_module.app.test_client()
+    monkeypatch.setattr(app_module.reloader, "interval", 5)
+    resp = client.get("/api/lookup?chars=東")
+    assert resp.headers["ETag"]
+    assert f"max-age={app_module.RELOAD_MAX_AGE}" in resp.headers["Cache-Control"]
+    assert client.get("/api/lookup?chars=東",
+                      headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+
+
+def test_default_deployment_is_cacheable(monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "")
+    assert app_module.reloader.interval == 0
+    resp = app_module.app.test_client().get("/api/lookup?chars=東")
+    assert resp.headers["Cache-Control"] == f"public, max-age={app_module.HTTP_MAX_AGE}"
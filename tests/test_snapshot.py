@@ -0,0 +1,39 @@
+# tests/test_snapshot.py
+# 分段快照：读取时只解析头部，各段按需反序列化；源文件变了（指纹不同）则视为过期。
+import pytest
+
+import snapshot
+
+
+@pytest.fixture(scope="module")
+def written(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("snapshot") / "guangyun.snapshot")
+    return path, snapshot.write_snapshot(path, snapshot.load_dataset())
+
+
+def test_sections_load_lazily(written):
+    path, dataset = written
+    loaded = snapshot.load_snapshot(path)
+    assert isinstance(loaded, snapshot.LazySections)
+    assert not loaded._loaded
+    assert loaded["version"] == dataset["version"]
+    assert list(loaded) == list(dataset)
+    assert set(loaded._loaded) == {"version"}
+
+
+def test_homophones_split_by_direction(written):
+    path, dataset = written
+    homophones = snapshot.load_snapshot(path)["homophones"]
+    key = ("普通话", "粤语", False)
+    assert homophones[key] == dataset["homophones"][key]
+    assert list(homophones._loaded) == [key]
+    assert set(homophones) == set(dataset["homophones"])
+
+
+def test_stale_sources(written, monkeypatch):
+    path, _ = written
+    # (大小, 修改时间) 变了但内容指纹未变：仍可用
+    monkeypatch.setattr(snapshot, "source_stamps", lambda: {})
+    assert snapshot.load_snapshot(path) is not None
+    monkeypatch.setattr(snapshot, "source_digests", lambda: {})
+    assert snapshot.load_snapshot(path) is None
@@ -0,0 +1,103 @@
+# tests/test_variants.py
+# 异体字归并与原先“把繁体行复制给简体字”的字表逐字对拍：
+# 按原 convert.augment_with_simplified 的规则（kSimplifiedVariant 取第一个码位，复制繁体字的原有行）
+# 从 kuankhiunn.sqlite + Unihan_Variants.txt 重建每个字的广韵地位与中古全拼，
+# 与现在经别名表合并后查得的逐一比较。现代读音（普通话 / 粤语）原先按简体字本身的码位记录，
+# 不随复制的中古音各列而来：表内的字只应有其本身的现代读音。
+import re
+from collections import defaultdict
+
+import pytest
+
+import convert
+from model import split_readings
+from query import CSV_PATH, get_pronunciations, load_data, lookup, resolve_glyphs
+from snapshot import load_dataset
+
+VARIANT_RE = re.compile(r"U\+([0-9A-F]{4,5})")
+MODERN = ("mandarin_pinyin", "cantonese_jyutping")
+
+
+def baseline_trad2simp(path=convert.UNIHAN_VARIANTS):
+    trad2simp = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 3 or parts[1] != "kSimplifiedVariant":
+                continue
+            codes = VARIANT_RE.findall(parts[2])
+            if codes:
+                trad2simp[chr(int(parts[0][2:], 16))] = chr(int(codes[0], 16))
+    return trad2simp
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    """{字 : {(广韵信息, 中古全拼)}}：原先复制简体行后的字表"""
+    own = defaultdict(set)
+    for r in convert.export_guangyun():
+        info = f"{r['sjeng']}{r['xu']}{r['tonk']}{r['dew']}{r['hey']}".strip()
+        own[r["glyph"]].add((info, r["polyhedron中古全拼"].strip()))
+
+    statuses = {g: set(s) for g, s in own.items()}
+    for trad, simp in baseline_trad2simp().items():
+        if trad in own and simp != trad:
+            statuses.setdefault(simp, set()).update(own[trad])
+    return statuses
+
+
+@pytest.fixture(scope="module")
+def modern():
+    """{字 : {读音列 : {读音}}}：表内各字本身的现代读音"""
+    own = defaultdict(lambda: defaultdict(set))
+    for row in load_data(CSV_PATH):
+        for col in MODERN:
+            own[row["glyph"]][col].update(split_readings(row[col]))
+    return own
+
+
+@pytest.fixture(scope="module")
+def indexes():
+    return load_dataset()["indexes"]
+
+
+def test_same_readings_as_copied_rows(baseline, indexes):
+    mismatched = {}
+    for glyph, statuses in baseline.items():
+        records = lookup(indexes, glyph)
+        infos = {l for r in records for l in r.lines("广韵信息")}
+        middle = {l for r in records for l in r.lines("polyhedron中古全拼")}
+        if infos != {i for i, _ in statuses if i} or middle != {m for _, m in statuses if m}:
+            mismatched[glyph] = resolve_glyphs(indexes, glyph)
+    assert not mismatched, f"{len(mismatched)} 字读音不同：{list(mismatched.items())[:10]}"
+
+
+def test_own_modern_readings(modern, indexes):
+    mismatched = {
+        (glyph, col): get_pronunciations(indexes, glyph, col)
+        for glyph, cols in modern.items() for col in MODERN
+        if set(get_pronunciations(indexes, glyph, col)) != cols[col]
+    }
+    assert not mismatched, f"{len(mismatched)} 处现代读音不同：{list(mismatched.items())[:10]}"
+
+
+@pytest.mark.parametrize("char, col, expected", [
+    ("只", "mandarin_pinyin", ["zhī", "zhǐ"]),
+    ("只", "cantonese_jyutping", ["zek3", "zi1", "zi2"]),
+    ("只", "polyhedron中古全拼", ["cje", "cjek", "cjex", "cjik", "gje"]),
+    ("同", "mandarin_pinyin", ["tong", "tòng", "tóng"]),
+    ("东", "cantonese_jyutping", ["dung1"]),
+])
+def test_pronunciations(indexes, char, col, expected):
+    assert get_pronunciations(indexes, char, col) == expected
+
+
+@pytest.mark.parametrize("char, expected", [
+    ("只", ("只", "戠", "衹", "隻")),
+    ("面", ("面", "麵")),
+    ("东", ("東",)),
+    ("發", ("發",)),
+    ("A", ()),
+])
+def test_resolve(indexes, char, expected):
+    assert resolve_glyphs(indexes, char) == expected
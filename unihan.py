@@ -0,0 +1,182 @@
+# unihan.py
+# Unihan 数据文件（Unihan_Readings.txt / Unihan_Variants.txt）的共用读取器：
+#   * 每个文件只流式读一遍，只处理需要的字段，正则全部预编译
+#   * 文件较大时按字节区间切块（切点对齐到行首），交给进程池并行解析后合并
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+UCODE_RE = re.compile(r"U\+[0-9A-F]{4,6}")
+
+# 超过此大小（且未指定 workers）才启用进程池
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+
+MANDARIN_FIELDS = {"kMandarin", "kHanyuPinyin", "kHanyuPinlu", "kTGHZ2013", "kXHC1983"}
+READINGS_FIELDS = MANDARIN_FIELDS | {"kCantonese", "kSMSZD2003Readings"}
+VARIANTS_FIELDS = {"kSimplifiedVariant"}
+VARIANT_LINK_FIELDS = {"kSimplifiedVariant", "kTraditionalVariant", "kZVariant", "kSemanticVariant"}
+
+MANDARIN_SPLIT = re.compile(r"[,\s;:()]+")
+CANTONESE_SPLIT = re.compile(r"[,\s;]+")
+PINYIN_RE = re.compile(r"[a-zāáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜü]+")
+JYUTPING_RE = re.compile(r"[a-z]+\d")
+SMSZD_JYUTPING_RE = re.compile(r"粵([a-z]+\d)")      # 如 "dàn粵daam6 xiáng粵hong4"
+VARIANT_RE = re.compile(r"U\+([0-9A-F]{4,5})")
+
+
+# ================================
+# 逐行读取
+# ================================
+def iter_fields(lines, fields):
+    """文本行 → (码位, 字段, 值)，只保留 fields 中的字段"""
+    for line in lines:
+        if not line.startswith("U+"):
+            continue
+        parts = line.strip().split("\t", 2)
+        if len(parts) < 3 or not parts[2]:
+            continue
+        ucode, key, val = parts
+        if key in fields and UCODE_RE.fullmatch(ucode):
+            yield ucode, key, val
+
+
+# ================================
+# 各文件的解析与合并
+# ================================
+def collect_readings(lines):
+    """→ {U+XXXX : {"mandarin": set, "cantonese": set}}"""
+    readings = {}
+    for ucode, key, val in iter_fields(lines, READINGS_FIELDS):
+        entry = readings.get(ucode)
+        if entry is None:
+            entry = readings[ucode] = {"mandarin": set(), "cantonese": set()}
+
+        if key in MANDARIN_FIELDS:
+            entry["mandarin"].update(
+                p for p in MANDARIN_SPLIT.split(val) if p and PINYIN_RE.fullmatch(p)
+            )
+        elif key == "kCantonese":
+            entry["cantonese"].update(
+                p for p in CANTONESE_SPLIT.split(val) if JYUTPING_RE.fullmatch(p)
+            )
+        else:  # kSMSZD2003Readings：只取其中的“粵xxx”
+            entry["cantonese"].update(SMSZD_JYUTPING_RE.findall(val))
+    return readings
+
+
+def merge_readings(parts):
+    readings = {}
+    for part in parts:
+        for ucode, d in part.items():
+            entry = readings.get(ucode)
+            if entry is None:
+                readings[ucode] = d
+            else:
+                entry["mandarin"] |= d["mandarin"]
+                entry["cantonese"] |= d["cantonese"]
+    return readings
+
+
+def collect_variants(lines):
+    """→ {繁体字 : 简体字}（取 kSimplifiedVariant 的第一个码位）"""
+    trad2simp = {}
+    for ucode, _, val in iter_fields(lines, VARIANTS_FIELDS):
+        simp_codes = VARIANT_RE.findall(val)
+        if simp_codes:
+            trad2simp[chr(int(ucode[2:], 16))] = chr(int(simp_codes[0], 16))
+    return trad2simp
+
+
+def merge_variants(parts):
+    trad2simp = {}
+    for part in parts:
+        trad2simp.update(part)
+    return trad2simp
+
+
+def collect_variant_links(lines):
+    """→ {字 : {字段 : [异体字…]}}（繁简、Z 变体、语义变体）"""
+    links = {}
+    for ucode, key, val in iter_fields(lines, VARIANT_LINK_FIELDS):
+        targets = [chr(int(c, 16)) for c in VARIANT_RE.findall(val)]
+        if targets:
+            links.setdefault(chr(int(ucode[2:], 16)), {}).setdefault(key, []).extend(targets)
+    return links
+
+
+def merge_variant_links(parts):
+    links = {}
+    for part in parts:
+        for ch, fields in part.items():
+            for key, targets in fields.items():
+                links.setdefault(ch, {}).setdefault(key, []).extend(targets)
+    return links
+
+
+PARSERS = {
+    "readings": (collect_readings, merge_readings),
+    "variants": (collect_variants, merge_variants),
+    "variant_links": (collect_variant_links, merge_variant_links),
+}
+
+
+# ================================
+# 切块与并行
+# ================================
+def chunk_ranges(path, n):
+    """把文件切成约 n 段字节区间 [(start, end)]，每段都从行首开始"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, n):
+            pos = size * i // n
+            if pos <= bounds[-1]:
+                continue
+            f.seek(pos)
+            f.readline()               # 跳到下一行行首
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _parse_range(args):
+    path, start, end, kind = args
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return PARSERS[kind][0](data.decode("utf-8").splitlines())
+
+
+def parse_file(path, kind, workers=None):
+    """
+    解析整个 Unihan 文件。
+    workers=None 时按文件大小自动决定；workers<=1 则单进程顺序读取。
+    """
+    collect, merge = PARSERS[kind]
+    if workers is None:
+        large = os.path.getsize(path) >= PARALLEL_MIN_BYTES
+        workers = (os.cpu_count() or 1) if large else 1
+    if workers <= 1:
+        with open(path, "r", encoding="utf-8") as f:
+            return collect(f)
+
+    ranges = chunk_ranges(path, workers)
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        parts = pool.map(_parse_range, [(path, s, e, kind) for s, e in ranges])
+        return merge(parts)
+
+
+def parse_readings(path, workers=None):
+    return parse_file(path, "readings", workers)
+
+
+def parse_variants(path, workers=None):
+    return parse_file(path, "variants", workers)
+
+
+def parse_variant_links(path, workers=None):
+    return parse_file(path, "variant_links", workers)